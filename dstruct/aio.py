@@ -0,0 +1,182 @@
+"""Asynchronous loading and mapping of raw data (requires Python 3.6 or above)"""
+
+import asyncio
+
+from .dstruct import DataStruct
+from .loader import Loader
+
+# the loop running a coroutine (get_running_loop is new in Python 3.7)
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+class AsyncLoader(object):
+    """Base class for loaders which provide data asynchronously
+
+    Subclasses override ``aload``, and if they provide many records, the
+    ``aiter_records`` async generator. Iterating over a loader with
+    ``async for`` iterates over its records.
+    """
+
+    async def aload(self):
+        pass
+
+    async def aiter_records(self):
+        """Asynchronously iterate over the raw records this loader provides
+
+        By default there is only one record - the data returned by ``aload``.
+        """
+        yield await self.aload()
+
+    def __aiter__(self):
+        return self.aiter_records()
+
+
+class ThreadedLoader(AsyncLoader):
+
+    def __init__(self, loader, queue_size=64, executor=None):
+        """Asynchronously provide the data of a :class:`Loader` by running it in a thread
+
+        Parameters
+        ----------
+        loader: Loader
+            The synchronous loader (e.g. a :class:`dstruct.loader.FileLoader`)
+            whose reads are offloaded to a thread.
+        queue_size: int
+            The number of records read ahead of the ones that have been consumed.
+            Reading stops once this many are waiting.
+        executor: concurrent.futures.Executor or None
+            The executor the loader runs in (default: the event loop's).
+        """
+        if not isinstance(loader, Loader):
+            m = "Expected an instance of '%s' got: '%s' instead"
+            raise ValueError(m % (Loader.__name__, repr(loader)))
+        self.loader = loader
+        self.queue_size = queue_size
+        self.executor = executor
+
+    async def aload(self):
+        loop = _running_loop()
+        return await loop.run_in_executor(self.executor, self.loader.load)
+
+    async def aiter_records(self):
+        loop = _running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        stop = []
+
+        def put(item):
+            # blocks the thread while the queue is full
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def read():
+            try:
+                for record in self.loader.iter_records():
+                    put((record, None))
+                    if stop:
+                        break
+            except Exception as e:
+                put((None, e))
+            finally:
+                put((_done, None))
+
+        reader = loop.run_in_executor(self.executor, read)
+        finished = False
+        try:
+            while not finished:
+                record, error = await queue.get()
+                finished = record is _done
+                if error is not None:
+                    raise error
+                elif not finished:
+                    yield record
+        finally:
+            stop.append(True)
+            # unblock the reader until it's finished
+            while not finished:
+                record, error = await queue.get()
+                finished = record is _done
+            await reader
+
+
+_done = object()
+
+
+class IterableSource(AsyncLoader):
+
+    def __init__(self, records, delay=0):
+        """An in-process stand-in for a source of records, like a socket
+
+        Parameters
+        ----------
+        records: iterable
+            The records this source provides.
+        delay: float
+            The number of seconds to wait before providing each record.
+        """
+        self.records = records
+        self.delay = delay
+
+    async def aload(self):
+        return [r async for r in self.aiter_records()]
+
+    async def aiter_records(self):
+        for record in self.records:
+            await asyncio.sleep(self.delay)
+            yield record
+
+
+def as_async_loader(loader, *args, **kwargs):
+    """Get an :class:`AsyncLoader` from a loader instance or class
+
+    Synchronous loaders are wrapped in a :class:`ThreadedLoader`. If a class is
+    given it is instantiated with any remaining arguments.
+    """
+    if isinstance(loader, type) and issubclass(loader, (Loader, AsyncLoader)):
+        loader = loader(*args, **kwargs)
+    if isinstance(loader, Loader):
+        loader = ThreadedLoader(loader)
+    if not isinstance(loader, AsyncLoader):
+        m = "Expected a subclass or instance of '%s' or '%s' got: '%s' instead"
+        raise ValueError(m % (Loader.__name__, AsyncLoader.__name__, repr(loader)))
+    return loader
+
+
+async def map_async(cls, records, *args, **kwargs):
+    """Map raw records from an async iterable onto new instances of a struct
+
+    The asynchronous counterpart to :meth:`DataStruct.map_many`.
+    """
+    new = cls._instance_factory(*args, **kwargs)
+    records = records.__aiter__()
+    try:
+        async for data in records:
+            inst = new()
+            inst.update(data)
+            yield inst
+    finally:
+        # stop the source (and any thread reading it) early
+        if hasattr(records, 'aclose'):
+            await records.aclose()
+
+
+class AsyncLoadedDataStruct(DataStruct):
+
+    @classmethod
+    async def aload(cls, loader, *a, **kw):
+        """Asynchronously load, and map raw data onto a new instance of this struct
+
+        Accepts an async or synchronous loader instance, or a loader class and
+        the arguments to create it with (see :func:`as_async_loader`).
+        """
+        data = await as_async_loader(loader, *a, **kw).aload()
+        inst = cls._instance_factory()()
+        inst.update(data)
+        return inst
+
+    @classmethod
+    def astream(cls, loader, *a, **kw):
+        """Asynchronously map each record a loader provides onto a new instance of this struct
+
+        Returns an async generator. See :meth:`AsyncLoadedDataStruct.aload`
+        for the arguments.
+        """
+        return map_async(cls, as_async_loader(loader, *a, **kw))
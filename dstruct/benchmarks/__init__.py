@@ -0,0 +1,12 @@
+"""Benchmarks for mapping raw data onto data structures
+
+Run them with the ``dstruct-bench`` script (or ``python -m dstruct.benchmarks``),
+which prints the throughput, per-record latency and peak memory of each case
+and can write them to a JSON file to compare later runs against::
+
+    dstruct-bench --records 100000 --output before.json
+    dstruct-bench --records 100000 --compare before.json update loaders
+"""
+
+from .runner import BENCHMARKS, Settings, Case, benchmark, consume, run, compare, main
+from . import cases
@@ -0,0 +1,304 @@
+"""The benchmarks of dstruct
+
+Each benchmark yields cases measured by :func:`dstruct.benchmarks.runner.measure`.
+"""
+
+from __future__ import division
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import contextlib
+
+from ..dstruct import HasDescriptors, BaseDescriptor, DataStruct, CompactDataStruct, DataField
+from ..loader import (JSONLoader, JSONLinesLoader, JSONArrayLoader, CSVLoader,
+                      MultiFileLoader, TableMapping, CompactTableMapping)
+from ..jsonstream import ijson
+from ..paths import parse_path
+from .runner import benchmark, Case, consume
+from .data import (nested_records, nested_struct, Event, CompactEvent, synthetic_records,
+                   write_jsonl, event_batches, BankAccount, Deposit, bank_records, write_bank_json,
+                   Person, TypedPerson, wide_table, narrow_table, write_csv)
+
+# the (depth, width) of nested records - varying the number of fields and nesting
+SHAPES = [(1, 4), (1, 16), (1, 64), (3, 8), (6, 8)]
+
+
+@contextlib.contextmanager
+def temporary_directory():
+    directory = tempfile.mkdtemp(prefix='dstruct-bench-')
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory)
+
+
+def megabytes(filename):
+    return round(os.path.getsize(filename) / 1e6, 2)
+
+
+@benchmark
+def bench_descriptors(settings):
+    """Create instances with HasDescriptors.__new__ and empty structs"""
+    n = settings.records
+    for members in (0, 8, 64):
+        cls = type('Members%i' % members, (HasDescriptors,),
+                   dict(('m%i' % i, BaseDescriptor()) for i in range(members)))
+        yield Case('HasDescriptors()', n, lambda: consume(cls() for i in range(n)),
+                   members=members)
+    for base in (DataStruct, CompactDataStruct):
+        for depth, width in SHAPES:
+            cls = nested_struct(depth, width, base)
+            yield Case('%s()' % base.__name__, n, lambda: consume(cls() for i in range(n)),
+                       fields=depth * width)
+
+
+@benchmark
+def bench_construct(settings):
+    """Map nested records by constructing structs one at a time and in batches"""
+    n = settings.records
+    for depth, width in SHAPES:
+        records = list(nested_records(n, depth, width))
+        cls = nested_struct(depth, width)
+        shape = {'depth': depth, 'width': width}
+        yield Case('constructor', n, lambda: consume(cls(r) for r in records), **shape)
+        yield Case('map_many', n, lambda: consume(cls.map_many(records)), **shape)
+        yield Case('map_columns', n, lambda: cls.map_columns(records), **shape)
+
+
+@benchmark
+def bench_update(settings):
+    """Compare the generated update methods of structs with generic and instrumented ones"""
+    n = settings.records
+    structs = [('Event', Event, synthetic_records), ('CompactEvent', CompactEvent, synthetic_records)]
+    for depth, width in SHAPES:
+        for base in (DataStruct, CompactDataStruct):
+            generate = lambda n, depth=depth, width=width: nested_records(n, depth, width)
+            name = '%s %ix%i' % (base.__name__, depth, width)
+            structs.append((name, nested_struct(depth, width, base), generate))
+    for name, cls, generate in structs:
+        records = list(generate(n))
+        generic = type(cls.__name__, (cls,), {'generate_update': False})
+        instrumented = type(cls.__name__, (cls,), {'instrumented': True})
+        for update, c in (('generic', generic), ('generated', cls),
+                          ('instrumented', instrumented)):
+            yield Case('%s.update' % name, n, lambda: consume(c.map_many(records)),
+                       update=update)
+
+
+@benchmark
+def bench_parsing(settings):
+    """Parse fields eagerly, lazily, through caches and from views"""
+    n = settings.records
+    depth, width = 1, 16
+    records = list(nested_records(n, depth, width))
+    eager = nested_struct(depth, width, parser=str)
+    lazy = nested_struct(depth, width, parser=str, lazy=True)
+    cached = nested_struct(depth, width, parser=str, cache_size=4096)
+    names = list(eager.fields())
+
+    def read_all(structs):
+        for s in structs:
+            for name in names:
+                getattr(s, name)
+
+    yield Case('eager', n, lambda: consume(eager.map_many(records)))
+    yield Case('eager read', n, lambda: read_all(eager.map_many(records)))
+    yield Case('cached', n, lambda: consume(cached.map_many(records)))
+    yield Case('lazy', n, lambda: consume(lazy.map_many(records)))
+    yield Case('lazy read', n, lambda: read_all(lazy.map_many(records)))
+    yield Case('view', n, lambda: consume(eager.map_views(records)))
+    yield Case('view read', n, lambda: read_all(eager.map_views(records)))
+
+
+@benchmark
+def bench_paths(settings):
+    """Index and fan out over lists with field paths rather than hand-written parsers"""
+    n = settings.records
+
+    class Paths(DataStruct):
+        amounts = DataField(*parse_path('events[*].amount'))
+        kinds = DataField(*parse_path('events[:5].meta.kind'))
+        first = DataField(*parse_path('rows[0].id'))
+
+    class Parsers(DataStruct):
+        amounts = DataField('events', parser=lambda v: [e['amount'] for e in v
+                                                        if isinstance(e, dict) and 'amount' in e])
+        kinds = DataField('events', parser=lambda v: [e['meta']['kind'] for e in v[:5]
+                                                      if isinstance(e, dict) and 'meta' in e
+                                                      and isinstance(e['meta'], dict)
+                                                      and 'kind' in e['meta']])
+        first = DataField('rows', parser=lambda v: v[0]['id'])
+
+    for events in (1, 10, 100):
+        records = list(event_batches(n, events))
+        for name, cls in (('paths', Paths), ('parsers', Parsers)):
+            yield Case('map_many', n, lambda: consume(cls.map_many(records)),
+                       fields=name, events=events)
+
+
+@benchmark
+def bench_table_mapping(settings):
+    """Build and look up cells of tables (like examples/data_files) in each encoding"""
+    n = settings.records
+    for form, table in (('wide', wide_table(n)), ('narrow', narrow_table(n))):
+        for cls in (TableMapping, CompactTableMapping):
+            yield Case('%s' % cls.__name__, n, lambda: cls(table, form), form=form)
+            yield Case('%s (inferred)' % cls.__name__, n, lambda: cls(table), form=form)
+            mapping = cls(table, form)
+            people = ['person-%d' % (i * 7919 % n) for i in range(n)]
+            yield Case('%s cell lookup' % cls.__name__, n,
+                       lambda: consume(mapping[p]['Age'] for p in people), form=form)
+            if cls is CompactTableMapping:
+                yield Case('%s column' % cls.__name__, n, lambda: mapping.column('Age'),
+                           form=form)
+            else:
+                yield Case('%s column' % cls.__name__, n,
+                           lambda: [r.get('Age') for r in mapping.values()], form=form)
+
+
+@benchmark
+def bench_loaders(settings):
+    """Read and map files of increasing size with each loader"""
+    with temporary_directory() as directory:
+        for n in sorted(set([max(1, settings.records // 10), settings.records])):
+            jsonl = os.path.join(directory, 'events-%i.jsonl' % n)
+            write_jsonl(jsonl, synthetic_records(n))
+            size = {'file_mb': megabytes(jsonl)}
+            for mmap in (False, True):
+                loader = JSONLinesLoader(jsonl, mmap=mmap)
+                yield Case('JSONLinesLoader', n, lambda: consume(loader.iter_records()),
+                           mmap=mmap, **size)
+                yield Case('Event.map_loader(JSONLinesLoader)', n,
+                           lambda: consume(Event.map_loader(loader)), mmap=mmap, **size)
+
+            # one bank_data.json shaped document holding n deposits
+            bank = os.path.join(directory, 'bank-%i.json' % n)
+            write_bank_json(bank, n)
+            size = {'file_mb': megabytes(bank)}
+            yield Case('JSONLoader', n, JSONLoader(bank).load, **size)
+            for backend in ('python', 'ijson') if ijson is not None else ('python',):
+                loader = JSONArrayLoader(bank, prefix=('account', 'deposited'), backend=backend)
+                yield Case('Deposit.map_loader(JSONArrayLoader)', n,
+                           lambda: consume(Deposit.map_loader(loader)), backend=backend, **size)
+
+            dtypes = {'Age': int, 'Weight': int}
+            for form, table in (('wide', wide_table(n)), ('narrow', narrow_table(n))):
+                table_file = os.path.join(directory, '%s-%i.csv' % (form, n))
+                write_csv(table_file, table)
+                size = {'file_mb': megabytes(table_file), 'form': form}
+                yield Case('CSVLoader.load', n, CSVLoader(table_file).load, **size)
+                yield Case('CSVLoader.load', n, CSVLoader(table_file, dtypes=dtypes).load,
+                           dtypes='typed', **size)
+                if form == 'wide':
+                    for mmap in (False, True):
+                        loader = CSVLoader(table_file, mmap=mmap)
+                        yield Case('Person.map_loader(CSVLoader)', n,
+                                   lambda: consume(Person.map_loader(loader)), mmap=mmap, **size)
+                    # columns converted by the loader rather than by parsers
+                    loader = CSVLoader(table_file, dtypes=dtypes)
+                    yield Case('TypedPerson.map_loader(CSVLoader)', n,
+                               lambda: consume(TypedPerson.map_loader(loader)), **size)
+
+            # many small bank_data.json shaped files
+            files = min(n, 2000)
+            folder = os.path.join(directory, 'accounts-%i' % n)
+            os.mkdir(folder)
+            for i, record in enumerate(bank_records(files)):
+                with open(os.path.join(folder, 'account-%05i.json' % i), 'w') as f:
+                    json.dump(record, f)
+            for workers in (1, 8):
+                loader = MultiFileLoader(folder, workers=workers)
+                yield Case('BankAccount.map_loader(MultiFileLoader)', files,
+                           lambda: consume(BankAccount.map_loader(loader)), workers=workers)
+
+
+@benchmark
+def bench_parse_cache(settings):
+    """Load files without a parse cache, and with cold and warm ones"""
+    from ..cache import ParseCache
+    n = settings.records
+    with temporary_directory() as directory:
+        bank = os.path.join(directory, 'bank.json')
+        write_bank_json(bank, n)
+        table = os.path.join(directory, 'wide.csv')
+        write_csv(table, wide_table(n))
+        for loader in (JSONLoader(bank), CSVLoader(table)):
+            label = '%s.load' % type(loader).__name__
+            size = {'file_mb': megabytes(loader.filepath)}
+            cache = ParseCache(os.path.join(directory, 'cache'), memory_size=None)
+            memory = ParseCache(os.path.join(directory, 'cache'))
+
+            def cold(loader=loader, cache=cache):
+                cache.clear()
+                return cache.load(loader)
+
+            yield Case(label, n, loader.load, cache='none', **size)
+            yield Case(label, n, cold, cache='cold', **size)
+            yield Case(label, n, lambda: cache.load(loader), cache='disk', **size)
+            memory.load(loader)
+            yield Case(label, n, lambda: memory.load(loader), cache='memory', **size)
+
+
+@benchmark
+def bench_serialize(settings):
+    """Serialize structs with repr, to_json and dump_many"""
+    from ..serialize import dump_many, orjson
+    n = settings.records
+    structs = list(Event.map_many(synthetic_records(n)))
+    yield Case('repr', n, lambda: consume(repr(s) for s in structs))
+    for backend in ('json', 'orjson') if orjson is not None else ('json',):
+        yield Case('to_json', n, lambda: consume(s.to_json(backend=backend) for s in structs),
+                   backend=backend)
+        yield Case('dump_many', n, lambda: dump_many(structs, io.BytesIO(), backend=backend),
+                   backend=backend)
+
+
+@benchmark
+def bench_export(settings):
+    """Write and read structs as JSON Lines and as columnar files"""
+    from ..serialize import dump_many
+    from ..export import write_structs, read_structs, numpy
+    if numpy is None:
+        return
+    n = settings.records
+    structs = list(Event.map_many(synthetic_records(n)))
+    with temporary_directory() as directory:
+        jsonl = os.path.join(directory, 'events.jsonl')
+        columns = os.path.join(directory, 'events')
+
+        def write_lines():
+            with open(jsonl, 'wb') as f:
+                dump_many(structs, f)
+
+        def write_columns():
+            if os.path.exists(columns):
+                shutil.rmtree(columns)
+            write_structs(columns, structs)
+
+        yield Case('dump_many', n, write_lines)
+        yield Case('write_structs', n, write_columns)
+        yield Case('Event.map_loader(JSONLinesLoader)', n,
+                   lambda: consume(Event.map_loader(JSONLinesLoader(jsonl))))
+        yield Case('read_structs', n, lambda: consume(read_structs(columns, Event)))
+
+
+@benchmark
+def bench_parallel(settings):
+    """Map records and files in this process and in a pool of workers"""
+    from ..parallel import ProcessPoolExecutor, map_shards
+    if ProcessPoolExecutor is None:
+        return
+    n = settings.records
+    workers = settings.workers
+    records = list(synthetic_records(n))
+    yield Case('map_many', n, lambda: consume(Event.map_many(records)))
+    yield Case('map_parallel', n, lambda: consume(Event.map_parallel(
+        records, workers, chunk_size=10000)), workers=workers)
+    with temporary_directory() as directory:
+        jsonl = os.path.join(directory, 'events.jsonl')
+        write_jsonl(jsonl, records)
+        yield Case('map_shards', n, lambda: consume(map_shards(
+            Event, jsonl, workers=workers, loader=JSONLinesLoader)), workers=workers)
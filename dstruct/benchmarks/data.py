@@ -0,0 +1,211 @@
+"""Synthetic data, and the structs it's mapped onto, for benchmarks
+
+Records are generated deterministically so runs can be compared. Besides
+records of arbitrary nesting depth and field count there are larger versions
+of the shapes in ``examples/data_files`` - bank account documents, and wide
+and narrow form tables of people.
+"""
+
+import csv
+import json
+
+from ..dstruct import DataStruct, CompactDataStruct, DataField, DataStructFromCSV
+
+
+# - - - - - - - - - - - - - -
+# Records of Arbitrary Shape
+# - - - - - - - - - - - - - -
+
+def nested_records(n, depth=3, width=8):
+    """Generate ``n`` records with ``width`` values at each of ``depth`` levels
+
+    Each level holds the keys ``"f0"`` to ``"f<width - 1>"`` along with a
+    ``"child"`` dict for the next level. Values cycle between integers,
+    strings and numeric strings.
+    """
+    for i in range(n):
+        record = child = {}
+        for level in range(depth):
+            for j in range(width):
+                k = (i + j) % 3
+                if k == 0:
+                    child['f%i' % j] = i + j
+                elif k == 1:
+                    child['f%i' % j] = 'value-%i' % ((i + j) % 1000)
+                else:
+                    child['f%i' % j] = str((i + j) % 100)
+            if level < depth - 1:
+                child['child'] = {}
+                child = child['child']
+        yield record
+
+
+def nested_struct(depth=3, width=8, base=DataStruct, parser=None, **kwargs):
+    """Create a struct with a field for every value of :func:`nested_records`
+
+    Fields are named ``"l<level>_f<j>"``. Every field has the given ``parser``,
+    and other keyword arguments are passed to each :class:`DataField`.
+    """
+    fields = {}
+    for level in range(depth):
+        for j in range(width):
+            path = ('child',) * level + ('f%i' % j,)
+            fields['l%i_f%i' % (level, j)] = DataField(*path, parser=parser, **kwargs)
+    name = 'Nested%s_%ix%i' % (base.__name__, depth, width)
+    return type(name, (base,), fields)
+
+
+def event_batches(n, events=10):
+    """Generate ``n`` records holding lists of ``events`` events and rows"""
+    for i in range(n):
+        yield {
+            'events': [{'amount': (i + j) % 100, 'meta': {'kind': 'k%i' % (j % 3)}}
+                       for j in range(events)],
+            'rows': [{'id': i * events + j} for j in range(events)],
+        }
+
+
+# - - - - - - - - - - - - - - - -
+# Events (defined at the top level
+# so workers can import them)
+# - - - - - - - - - - - - - - - -
+
+class Event(DataStruct):
+
+    id = DataField('id')
+    kind = DataField('payload', 'kind')
+    user = DataField('payload', 'meta', 'user')
+    source = DataField('payload', 'meta', 'source')
+    amount = DataField('payload', 'meta', 'amount', parser=float)
+    missing = DataField('payload', 'meta', 'missing')
+
+
+class CompactEvent(CompactDataStruct):
+
+    id = DataField('id')
+    kind = DataField('payload', 'kind')
+    user = DataField('payload', 'meta', 'user')
+    source = DataField('payload', 'meta', 'source')
+    amount = DataField('payload', 'meta', 'amount', parser=float)
+    missing = DataField('payload', 'meta', 'missing')
+
+
+def synthetic_records(n):
+    """Generate ``n`` nested records shaped for :class:`Event`"""
+    for i in range(n):
+        yield {'id': i, 'payload': {'kind': 'click', 'meta': {
+            'user': 'user-%d' % (i % 1000), 'source': 'web',
+            'amount': str(i % 100), 'extra': None}}}
+
+
+def write_jsonl(filename, records):
+    """Write records to a JSON Lines file, returning how many there were"""
+    count = 0
+    with open(filename, 'w') as f:
+        lines = []
+        for r in records:
+            lines.append(json.dumps(r))
+            if len(lines) == 10000:
+                f.write('\n'.join(lines) + '\n')
+                count += len(lines)
+                lines = []
+        if lines:
+            f.write('\n'.join(lines) + '\n')
+            count += len(lines)
+    return count
+
+
+# - - - - - - - - - - - - - - - - - - - -
+# Shapes of examples/data_files at Scale
+# - - - - - - - - - - - - - - - - - - - -
+
+class BankAccount(DataStruct):
+
+    user = DataField()
+    type = DataField('account', 'account-type')
+    ballance = DataField('account', 'account-ballance')
+    account_number = DataField('account', 'account-number',
+                               parser=lambda s: 'X' * len(s[:-4]) + s[-4:])
+
+
+class Deposit(DataStruct):
+
+    amount = DataField(parser=float)
+    time = DataField('utc-unix')
+    type = DataField('source', 'type')
+    note = DataField('source', 'note')
+
+
+def bank_records(n, transactions=2):
+    """Generate ``n`` documents shaped like ``bank_data.json``
+
+    Each account has the given number of deposits and withdrawals.
+    """
+    for i in range(n):
+        yield {
+            'user': 'user-%i' % i,
+            'billing-address': '%i Any Street / Smallville, KS 1235' % i,
+            'account': {
+                'account-type': 'checking' if i % 2 else 'savings',
+                'routing-number': '%09i' % (i % 999999999),
+                'account-number': '%09i' % i,
+                'account-ballance': float(i % 100000) / 100,
+                'deposited': bank_transactions(i, transactions, 'mobile-deposit'),
+                'withdrawn': bank_transactions(i, transactions, 'purchase'),
+            },
+        }
+
+
+def bank_transactions(seed, n, kind):
+    """Return ``n`` transactions keyed by their index, like ``bank_data.json``"""
+    return dict((str(j), {
+        'amount': '%.2f' % ((seed + j) % 1000 + 0.25),
+        'utc-unix': 1457476491 + seed + j,
+        'time-zone': 'UTC-8',
+        'source': {'type': kind, 'ref': '#IB%08i' % (seed + j),
+                   'note': 'transaction %i' % j},
+    }) for j in range(n))
+
+
+def write_bank_json(filename, transactions):
+    """Write one ``bank_data.json`` shaped document with many transactions"""
+    with open(filename, 'w') as f:
+        json.dump(next(bank_records(1, transactions)), f)
+
+
+class Person(DataStructFromCSV):
+
+    name = DataField('Person')
+    age = DataField('Age', parser=int)
+    weight = DataField('Weight', parser=int)
+
+
+class TypedPerson(DataStructFromCSV):
+    """A :class:`Person` for tables whose columns are converted by the loader"""
+
+    name = DataField('Person')
+    age = DataField('Age')
+    weight = DataField('Weight')
+
+
+def wide_table(n):
+    """Return the rows of a table of ``n`` people shaped like ``wide.csv``"""
+    rows = [['Person', 'Age', 'Weight']]
+    for i in range(n):
+        rows.append(['person-%d' % i, str(20 + i % 60), str(100 + i % 150)])
+    return rows
+
+
+def narrow_table(n):
+    """Return the rows of a table of ``n`` people shaped like ``narrow.csv``"""
+    rows = [['Person', 'Variable', 'Value']]
+    for i in range(n):
+        rows.append(['person-%d' % i, 'Age', str(20 + i % 60)])
+        rows.append(['person-%d' % i, 'Weight', str(100 + i % 150)])
+    return rows
+
+
+def write_csv(filename, rows):
+    """Write rows to a CSV file"""
+    with open(filename, 'w') as f:
+        csv.writer(f).writerows(rows)
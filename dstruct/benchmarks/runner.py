@@ -0,0 +1,249 @@
+"""Running benchmarks and recording their results"""
+
+from __future__ import print_function, division
+
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+from collections import OrderedDict, deque
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+from .._version import __version__
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# registered benchmark names and their generator functions
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(func):
+    """Register a benchmark under its function's name (without a ``bench_`` prefix)
+
+    A benchmark is a generator function accepting :class:`Settings`, which
+    yields a :class:`Case` for each operation it measures. Each case is
+    measured before the next is requested, so data a benchmark writes to
+    temporary files can be removed in a ``finally`` clause.
+    """
+    name = func.__name__
+    if name.startswith('bench_'):
+        name = name[len('bench_'):]
+    BENCHMARKS[name] = func
+    return func
+
+
+class Settings(object):
+
+    def __init__(self, records=50000, repeat=3, memory=True, workers=None):
+        """The size and thoroughness of a benchmark run
+
+        Parameters
+        ----------
+        records: int
+            The number of records each case processes (benchmarks may derive
+            larger or smaller sizes from it).
+        repeat: int
+            The number of times each case is timed - the fastest time is kept.
+        memory: bool (default: True)
+            Whether the peak memory of each case is measured (in an extra run,
+            which requires :mod:`tracemalloc`).
+        workers: int or None
+            The number of processes used by parallel benchmarks.
+        """
+        self.records = records
+        self.repeat = repeat
+        self.memory = memory and tracemalloc is not None
+        self.workers = workers
+
+    def to_dict(self):
+        return {'records': self.records, 'repeat': self.repeat,
+                'memory': self.memory, 'workers': self.workers}
+
+
+class Case(object):
+
+    def __init__(self, name, records, func, **params):
+        """An operation measured by a benchmark
+
+        Parameters
+        ----------
+        name: str
+            What the case measures, unique amongst the cases of its benchmark
+            with the same parameters.
+        records: int
+            The number of records (or other units) processed by each call.
+        func: callable
+            Called without arguments to perform the operation.
+        **params:
+            JSON serializable parameters of the case, like the shape of its data.
+        """
+        self.name = name
+        self.records = records
+        self.func = func
+        self.params = params
+
+
+def consume(iterable):
+    """Exhaust an iterable without keeping its items"""
+    deque(iterable, maxlen=0)
+
+
+def measure(benchmark, case, settings):
+    """Time a case, returning a dict of its results"""
+    times = []
+    for i in range(settings.repeat):
+        gc.collect()
+        start = timer()
+        case.func()
+        times.append(timer() - start)
+    seconds = min(times)
+    peak = None
+    if settings.memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return OrderedDict([
+        ('benchmark', benchmark),
+        ('case', case.name),
+        ('params', case.params),
+        ('records', case.records),
+        ('seconds', seconds),
+        ('records_per_second', case.records / seconds if seconds else None),
+        ('latency_us', seconds * 1e6 / case.records if case.records else None),
+        ('peak_memory_bytes', peak),
+    ])
+
+
+def run(names=None, settings=None, out=sys.stdout):
+    """Run benchmarks, printing and returning the results of their cases
+
+    Parameters
+    ----------
+    names: sequence of str or None
+        The benchmarks to run (by default all of them).
+    settings: Settings or None
+        The size of the run.
+    out: file or None
+        Where a table of results is printed as they're measured.
+    """
+    settings = settings or Settings()
+    results = []
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark %r" % name)
+        if out is not None:
+            print(name, file=out)
+        for case in BENCHMARKS[name](settings):
+            result = measure(name, case, settings)
+            results.append(result)
+            if out is not None:
+                print(format_result(result), file=out)
+                out.flush()
+    return results
+
+
+def format_label(result):
+    """Describe the case of a result along with its parameters"""
+    label = result['case']
+    if result['params']:
+        label += ' [%s]' % ', '.join('%s=%s' % kv for kv in sorted(result['params'].items()))
+    return label
+
+
+def format_result(result):
+    """Format a result as a row of a table"""
+    label = format_label(result)
+    peak = result['peak_memory_bytes']
+    return '  %-72s %9.3fs %12.0f rec/s %9.2fus %s' % (
+        label, result['seconds'], result['records_per_second'] or 0,
+        result['latency_us'] or 0, '%9.1f MB' % (peak / 1e6) if peak is not None else '')
+
+
+def run_info(settings):
+    """Describe the environment of a run"""
+    return OrderedDict([
+        ('dstruct', __version__),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('created', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('settings', settings.to_dict()),
+    ])
+
+
+def result_key(result):
+    """Identify the same case across runs"""
+    return (result['benchmark'], result['case'], json.dumps(result['params'], sort_keys=True))
+
+
+def compare(results, baseline, out=sys.stdout):
+    """Print the throughput of results relative to those of a baseline run
+
+    Returns a list of ``(result, ratio)`` pairs for cases in both runs, where
+    ``ratio`` is the new records per second over the baseline's.
+    """
+    before = dict((result_key(r), r) for r in baseline['results'])
+    ratios = []
+    for r in results:
+        b = before.get(result_key(r))
+        if b is None or not b['records_per_second'] or not r['records_per_second']:
+            continue
+        ratio = r['records_per_second'] / b['records_per_second']
+        ratios.append((r, ratio))
+        if out is not None:
+            print('  %-16s %-72s %6.2fx' % (r['benchmark'], format_label(r), ratio), file=out)
+    return ratios
+
+
+def main(argv=None):
+    """Run benchmarks from the command line - see ``dstruct-bench --help``"""
+    parser = argparse.ArgumentParser(
+        prog='dstruct-bench', description="Benchmark mapping data onto dstruct structures")
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help="benchmarks to run (default: all of them)")
+    parser.add_argument('-n', '--records', type=int, default=50000,
+                        help="the number of records processed by each case")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="the number of times each case is timed")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="the number of processes of parallel benchmarks")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip measuring the peak memory of each case")
+    parser.add_argument('-o', '--output', help="write the results to a JSON file")
+    parser.add_argument('-c', '--compare', metavar='BASELINE',
+                        help="compare the results with a JSON file written by a previous run")
+    parser.add_argument('-l', '--list', action='store_true', help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, func in BENCHMARKS.items():
+            print('%-16s %s' % (name, (func.__doc__ or '').strip().split('\n')[0]))
+        return 0
+    unknown = [b for b in args.benchmarks if b not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ', '.join(unknown))
+
+    settings = Settings(args.records, args.repeat, not args.no_memory, args.workers)
+    results = run(args.benchmarks, settings, sys.stdout)
+    document = run_info(settings)
+    document['results'] = results
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('compared with %s' % args.compare)
+        compare(results, baseline, sys.stdout)
+    return 0
@@ -0,0 +1,204 @@
+"""A persistent cache of the data loaders parse from files
+
+Parsing large JSON or CSV files is often far slower than unpickling what was
+parsed from them. A :class:`ParseCache` keeps the result of each
+:meth:`dstruct.loader.FileLoader.load` in a pickle file, named by the
+identity of the loaded file (its path, size and modification time) and the
+parameters of its loader, so it's reused until the file changes.
+"""
+
+import gc
+import os
+import errno
+import hashlib
+import tempfile
+
+import six
+from six.moves import cPickle as pickle
+
+from .utils import LRUCache, missing
+
+
+def default_directory():
+    """The directory of caches made without one (under ``$XDG_CACHE_HOME``, or ``~/.cache``)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dstruct')
+
+
+class ParseCache(object):
+
+    # the attributes of loaders which don't change what they load
+    ignored_params = frozenset(['filepath', 'stats', 'cache', 'errors', 'mmap'])
+
+    def __init__(self, directory=None, max_bytes=1 << 30, memory_size=8):
+        """Keep the data loaders parse from files on disk, and in memory
+
+        Parameters
+        ----------
+        directory: str or None
+            Where pickled data is kept (by default see :func:`default_directory`).
+            Pickles are trusted, so it must not be writable by others.
+        max_bytes: int or None
+            The total size of the pickle files kept. Once it's exceeded, the
+            least recently used files are removed. ``None`` means no limit.
+        memory_size: int or None
+            The number of loaded results also kept in memory, in a
+            :class:`dstruct.utils.LRUCache` (``None`` skips keeping them).
+            Those results are shared by every load of their file, so they
+            must not be mutated.
+
+        Files are only cached by loaders whose parameters can be identified
+        across processes - not for example by their ``repr``, if it includes
+        the address of a function.
+        """
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(memory_size) if memory_size else None
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, loader):
+        """Return what a :class:`dstruct.loader.FileLoader` loads, from this cache if possible"""
+        key = self.key(loader)
+        if key is None:
+            return loader._load_file()
+        if self.memory is not None:
+            data = self.memory.get(key, missing)
+            if data is not missing:
+                self.hits += 1
+                return data
+        data = self._read(key)
+        if data is missing:
+            self.misses += 1
+            data = loader._load_file()
+            self._write(key, data)
+        else:
+            self.hits += 1
+        if self.memory is not None:
+            self.memory.put(key, data)
+        return data
+
+    def key(self, loader):
+        """Identify what a loader loads, or return ``None`` if it can't be identified
+
+        The key is a digest of the loader's class, the path, size and
+        modification time of its file, and the loader's other attributes.
+        """
+        try:
+            stat = os.stat(loader.filepath)
+        except (OSError, TypeError):
+            return None
+        params = sorted((k, v) for k, v in vars(loader).items() if k not in self.ignored_params)
+        identity = repr((type(loader).__module__, type(loader).__name__,
+                         os.path.abspath(loader.filepath), stat.st_size,
+                         getattr(stat, 'st_mtime_ns', stat.st_mtime), params))
+        if ' at 0x' in identity:
+            # the parameter's identity is only known to this process
+            return None
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def info(self):
+        """Return the ``hits`` and ``misses`` of this cache, and the ``files`` and ``bytes`` on disk"""
+        entries = self._entries()
+        info = {'hits': self.hits, 'misses': self.misses, 'files': len(entries),
+                'bytes': sum(size for mtime, size, path in entries)}
+        if self.memory is not None:
+            info['memory'] = self.memory.info()
+        return info
+
+    def clear(self):
+        """Remove every cached file, forget the data in memory, and reset the hit and miss counts"""
+        for mtime, size, path in self._entries():
+            _remove(path)
+        if self.memory is not None:
+            self.memory.clear()
+        self.hits = self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = _unpickle(f)
+        except (IOError, OSError):
+            return missing
+        except Exception:
+            # a corrupt or incompatible pickle
+            _remove(path)
+            return missing
+        try:
+            # mark the file as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def _write(self, key, data):
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, temporary = tempfile.mkstemp('.tmp', key, self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            # replace the file in one step, so it's never read half written
+            if six.PY2 and os.name == 'nt':
+                _remove(self._path(key))
+            getattr(os, 'replace', os.rename)(temporary, self._path(key))
+        except Exception:
+            _remove(temporary)
+            raise
+        self._evict(self._path(key))
+
+    def _entries(self):
+        # the modification time, size and path of each cached file
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith('.pickle'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self, written):
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            # the file just written is kept even if it's too large
+            if path != written:
+                _remove(path)
+                total -= size
+
+
+def _unpickle(f):
+    # large nested data creates so many containers that garbage collection,
+    # triggered by the allocations, would take most of the time spent loading
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.load(f)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,167 @@
+"""Generation of ``update`` methods specialized to the fields of a struct"""
+
+import six
+
+from .paths import is_mapping, is_sequence
+from .instrument import timer
+
+
+def compile_update(cls, fields, parsers, generic, stats=None):
+    """Generate an ``update`` method with the fields of a struct inlined
+
+    Parameters
+    ----------
+    cls: DataStruct subclass
+        The struct the method is generated for.
+    fields: dict
+        The struct's field names and :class:`DataField` instances.
+    parsers: dict
+        The struct's field names and :class:`dataparser` instances.
+    generic: function
+        The ``update`` method the generated one replaces. It's used instead
+        when the method is called on an instance of a different class.
+    stats: StructStats or None
+        If given, the method is instrumented - it counts the records mapped
+        and the fields found, and times each parser call and the method itself
+        (see :mod:`dstruct.instrument`). Otherwise none of this is generated.
+
+    The generated method follows the paths of the struct's compiled prefix
+    trie with nested lookups (and the accessors of paths which fan out), calls each field's parser function directly
+    (or defers it for lazy fields) and stores the parsed value in the field's
+    slot or its ``_field_values`` dict. Fields whose class customizes how
+    values are set or parsed are set with ``setattr`` as they are in the
+    generic ``update`` (as are all fields of instrumented structs which
+    customize ``__setattr__``, and parser time of such fields includes
+    setting them).
+    """
+    from .dstruct import _Unparsed
+    namespace = {'cls': cls, 'generic': generic, 'setattr': setattr,
+                 'isinstance': isinstance, 'dict': dict, 'list': list, 'len': len,
+                 'is_mapping': is_mapping, 'is_sequence': is_sequence}
+    lines = []
+    if stats is not None:
+        namespace['timer'] = timer
+    # whether fields may be set without calling setattr
+    plain = cls.__setattr__ is object.__setattr__
+
+    def ref(obj, prefix):
+        # refer to objects from the namespace rather than their reprs
+        name = '%s%i' % (prefix, len(namespace))
+        namespace[name] = obj
+        return name
+
+    def assign(name, value, indent):
+        f = fields[name]
+        p = parsers.get(name)
+        lazy = p is not None and f.is_lazy(cls)
+        if stats is not None:
+            counter = ref(stats.fields[name], 'f')
+            lines.append('%s%s.hits += 1' % (indent, counter))
+            if lazy:
+                lines.append('%s%s.deferred += 1' % (indent, counter))
+            elif p is not None:
+                # time the parser by itself, before the value is set
+                lines.append('%st = timer()' % indent)
+        if not (plain and _inlinable(f, p)):
+            lines.append('%ssetattr(self, %s, %s)' % (indent, ref(name, 'n'), value))
+            if stats is not None and p is not None and not lazy:
+                lines.append('%s%s.add_parse(timer() - t)' % (indent, counter))
+            return
+        if p is not None:
+            if lazy:
+                value = '%s(%s)' % (ref(_Unparsed, 'u'), value)
+            elif p.method_type:
+                value = '%s(self, %s)' % (ref(p._func, 'p'), value)
+            else:
+                value = '%s(%s)' % (ref(p._func, 'p'), value)
+            if stats is not None and not lazy:
+                lines.append('%sv = %s' % (indent, value))
+                lines.append('%s%s.add_parse(timer() - t)' % (indent, counter))
+                value = 'v'
+        if f.slot is None:
+            lines.append('%svalues[%s] = %s' % (indent, ref(name, 'n'), value))
+        else:
+            lines.append('%s%s(self, %s)' % (indent, ref(f.slot.__set__, 's'), value))
+
+    def walk(node, var, depth):
+        indent = '    ' * (depth + 1)
+        names, branches, fanouts, indexes = node
+        for n in names:
+            assign(n, var, indent)
+        for n, get in fanouts:
+            # paths which fan out are followed by their compiled accessor
+            lines.append('%stry:' % indent)
+            lines.append('%s    v = %s(%s)' % (indent, ref(get, 'a'), var))
+            lines.append('%sexcept KeyError:' % indent)
+            lines.append('%s    pass' % indent)
+            lines.append('%selse:' % indent)
+            assign(n, 'v', indent + '    ')
+        if indexes:
+            # lists are indexed without checking whether they're mappings
+            lines.append('%sif isinstance(%s, dict) or (not isinstance(%s, list) '
+                         'and is_mapping(%s)):' % (indent, var, var, var))
+        elif branches:
+            lines.append('%sif isinstance(%s, dict) or is_mapping(%s):' % (indent, var, var))
+        if branches:
+            for key, child in branches:
+                k = ref(key, 'k')
+                lines.append('%s    if %s in %s:' % (indent, k, var))
+                branch(child, '%s[%s]' % (var, k), indent, depth)
+        if indexes:
+            lines.append('%selif isinstance(%s, list) or is_sequence(%s):' % (indent, var, var))
+            for key, child in indexes:
+                k = ref(key, 'k')
+                lines.append('%s    if -len(%s) <= %s < len(%s):' % (indent, var, k, var))
+                branch(child, '%s[%s]' % (var, k), indent, depth)
+
+    def branch(child, value, indent, depth):
+        if child[1] or child[2]:
+            child_var = 'd%i' % (depth + 1)
+            lines.append('%s        %s = %s' % (indent, child_var, value))
+            walk(child, child_var, depth + 2)
+        else:
+            # leaves are looked up where they're set
+            for n in child[0]:
+                assign(n, value, indent + '        ')
+
+    walk(cls._field_trie, 'd0', 1)
+    head = ['def update(self, data=None):',
+            '    if self.__class__ is not cls:',
+            '        return generic(self, data)',
+            '    if data is not None:',
+            '        values = self._field_values' if _uses_values(fields) else '        pass',
+            '        d0 = data']
+    if stats is not None:
+        s = ref(stats, 'st')
+        head.append('        start = timer()')
+        lines.append('        %s.records += 1' % s)
+        lines.append('        %s.seconds += timer() - start' % s)
+    source = '\n'.join(head + lines)
+    six.exec_(compile(source, '<generated %s.update>' % cls.__name__, 'exec'), namespace)
+    update = namespace['update']
+    update.__doc__ = generic.__doc__
+    update.__module__ = cls.__module__
+    update.__qualname__ = '%s.update' % cls.__name__
+    update.generated = True
+    return update
+
+
+def _uses_values(fields):
+    return any(f.slot is None for f in fields.values())
+
+
+def _inlinable(field, parser):
+    # fields and parsers which behave like the base classes
+    from .dstruct import DataField, dataparser
+    t = type(field)
+    for name in ('__set__', 'set', 'parse_value', 'is_lazy'):
+        if six.get_unbound_function(getattr(t, name)) is not \
+                six.get_unbound_function(getattr(DataField, name)):
+            return False
+    if parser is not None:
+        if parser._func is None:
+            return False
+        if six.get_unbound_function(type(parser).__call__) is not \
+                six.get_unbound_function(dataparser.__call__):
+            return False
+    return True
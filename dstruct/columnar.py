@@ -0,0 +1,102 @@
+"""Mapping of raw records onto NumPy arrays - one per field"""
+
+from .paths import resolve_paths
+from .utils import missing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def map_arrays(cls, records, *args, **kwargs):
+    """Map raw records onto a dict of NumPy arrays for each field of a struct
+
+    Parameters
+    ----------
+    cls: DataStruct subclass
+        The struct whose fields should be extracted from each record.
+    records: iterable
+        The raw data for each row of the arrays.
+    *args, **kwargs:
+        Used to create an instance of ``cls`` for each record, which
+        method type parsers are bound to (see :meth:`DataStruct.map_many`).
+
+    Returns
+    -------
+    A dict of field names to arrays typed by the ``dtype`` of their field. Where
+    a field is absent from some records, its array is filled with ``nan`` if
+    it's a float (or complex) array, otherwise it's a masked array. Vectorized
+    parsers are called once with an array of all the field's raw values.
+    """
+    if numpy is None:
+        raise ImportError("Mapping records onto arrays requires numpy")
+    trie = cls._field_trie
+    names = tuple(cls._field_paths)
+    vectorized = {}
+    for n in names:
+        p = cls._field_parsers.get(n)
+        if p is not None and p.vectorized:
+            vectorized[n] = p
+    columns = dict((n, []) for n in names)
+    new = cls._instance_factory(*args, **kwargs)
+    inst = None
+    for data in records:
+        inst = new()
+        raw = {}
+        for n, v in resolve_paths(trie, data):
+            if n in vectorized:
+                raw[n] = v
+            else:
+                setattr(inst, n, v)
+        values = inst._parsed_field_values()
+        for n in names:
+            c = columns[n]
+            if n in raw:
+                c.append(raw[n])
+            elif n in values:
+                c.append(values[n])
+            else:
+                c.append(missing)
+    if vectorized and inst is None:
+        inst = new()
+
+    arrays = {}
+    for n in names:
+        dtype = getattr(cls, n).dtype
+        p = vectorized.get(n)
+        if p is not None:
+            p = p.get(inst, cls)
+        arrays[n] = _to_array(columns[n], dtype, p)
+    return arrays
+
+
+def _to_array(column, dtype, vectorized=None):
+    mask = numpy.fromiter((v is missing for v in column), bool, len(column))
+    if mask.any():
+        present = [v for v in column if v is not missing]
+    else:
+        present = column
+    values = _as_1d(present, dtype if vectorized is None else None)
+    if vectorized is not None:
+        values = numpy.asarray(vectorized(values), dtype=dtype)
+    if present is column:
+        return values
+    if values.dtype.kind in 'fc':
+        array = numpy.full(len(column), numpy.nan, values.dtype)
+    else:
+        array = numpy.ma.masked_all(len(column), values.dtype)
+    array[~mask] = values
+    return array
+
+
+def _as_1d(values, dtype):
+    try:
+        array = numpy.array(values, dtype=dtype)
+    except ValueError:
+        array = None
+    if array is None or array.ndim != 1:
+        # values are themselves sequences
+        array = numpy.empty(len(values), object if dtype is None else dtype)
+        array[:] = values
+    return array
@@ -0,0 +1,222 @@
+"""Conversion of the cells of tables from strings into typed values
+
+Columns are converted in blocks of rows, by mapping a builtin converter (like
+``int`` or ``float``) over each column of a block at once, rather than by
+calling a parser for each cell of each record.
+"""
+
+import itertools
+
+import six
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_TRUE = frozenset(['true', 't', 'yes', 'y', '1'])
+_FALSE = frozenset(['false', 'f', 'no', 'n', '0'])
+
+# the types of values returned for the kinds of NumPy dtypes
+_NUMPY_KINDS = {'i': int, 'u': int, 'f': float, 'c': complex, 'U': six.text_type, 'S': bytes}
+
+
+def parse_bool(value):
+    """Convert strings like "true", "yes" or "1" (and their opposites) into booleans"""
+    v = value.strip().lower()
+    if v in _TRUE:
+        return True
+    if v in _FALSE:
+        return False
+    raise ValueError("Expected a boolean, not %r" % value)
+
+
+# the converters of dtypes given by name
+_NAMES = {'int': int, 'float': float, 'complex': complex, 'str': six.text_type,
+          'bool': parse_bool}
+
+
+def converter(dtype):
+    """Return a function converting strings into values of a dtype
+
+    The dtype may be ``int``, ``float``, ``bool`` or a string type, the name of
+    one of those types, a NumPy dtype (or its name), or any function which
+    accepts a string.
+    """
+    if dtype is bool:
+        return parse_bool
+    if any(dtype is t for t in (int, float, complex, bytes, str, six.text_type)):
+        return dtype
+    if isinstance(dtype, six.string_types) and dtype in _NAMES:
+        return _NAMES[dtype]
+    if numpy is not None and (isinstance(dtype, (six.string_types, numpy.dtype)) or
+                              isinstance(dtype, type) and issubclass(dtype, numpy.generic)):
+        try:
+            kind = numpy.dtype(dtype).kind
+        except TypeError:
+            kind = None
+        if kind == 'b':
+            return parse_bool
+        if kind in _NUMPY_KINDS:
+            return _NUMPY_KINDS[kind]
+    elif callable(dtype):
+        return dtype
+    raise ValueError("Cells can't be converted to the dtype %r" % (dtype,))
+
+
+def convert_column(values, dtype, empty=None, name=None):
+    """Convert a sequence of strings into a list of typed values
+
+    Parameters
+    ----------
+    values: sequence
+        The cells of a column.
+    dtype: any
+        The type the cells are converted to (see :func:`converter`).
+    empty: any
+        The value of empty cells. With ``dstruct.utils.missing`` they're left
+        out of the records (or tables) they're in.
+    name: any
+        The name of the column, for error messages.
+    """
+    convert = converter(dtype)
+    try:
+        return list(map(convert, values))
+    except (ValueError, TypeError):
+        pass
+    # there are empty (or invalid) cells
+    converted = []
+    for v in values:
+        if v == '' or v is None:
+            converted.append(empty)
+        else:
+            try:
+                converted.append(convert(v))
+            except (ValueError, TypeError) as e:
+                m = "Can't convert %r in column %r to %r: %s"
+                raise ValueError(m % (v, name, dtype, e))
+    return converted
+
+
+def infer_dtype(values):
+    """Infer whether strings are all ``int`` or ``float`` values (otherwise ``None``)
+
+    Empty strings are ignored.
+    """
+    values = [v for v in values if v != '']
+    if not values:
+        return None
+    for dtype in (int, float):
+        try:
+            for v in values:
+                dtype(v)
+        except (ValueError, TypeError):
+            continue
+        return dtype
+    return None
+
+
+def infer_dtypes(header, rows, form='wide'):
+    """Infer the numeric dtypes of the columns (or narrow form variables) of a table
+
+    Returns a dict of the names of columns (or variables) whose cells in a
+    sample of rows are all integers or floats, to ``int`` or ``float``. The
+    first column of a wide form table holds row categories, so it's skipped.
+    """
+    if form == 'narrow':
+        columns = {}
+        for r in rows:
+            if len(r) >= 2:
+                columns.setdefault(r[-2], []).append(r[-1])
+    else:
+        # the first column holds the categories of rows, which stay strings
+        columns = dict((name, [r[j] for r in rows if len(r) > j])
+                       for j, name in enumerate(header[1:], 1))
+    dtypes = {}
+    for name, values in columns.items():
+        dtype = infer_dtype(values)
+        if dtype is not None:
+            dtypes[name] = dtype
+    return dtypes
+
+
+def convert_table(rows, form, dtypes, empty=None, sample_size=1000, block_size=1024):
+    """Lazily convert the cells of a table's rows into typed values
+
+    Parameters
+    ----------
+    rows: iterable
+        The rows of a table, beginning with its header.
+    form: "wide" or "narrow"
+        The encoding of the table (see :class:`dstruct.loader.TableMapping`).
+    dtypes: dict, "infer" or None
+        The dtypes of columns by their name in the header - or of narrow
+        form tables, the dtypes of values by their variable. If it's
+        "infer", the numeric columns are found from a sample of the rows.
+    empty: any
+        The value of empty cells in typed columns (see :func:`convert_column`).
+    sample_size: int
+        The number of rows dtypes are inferred from.
+    block_size: int
+        The number of rows whose columns are converted at a time.
+    """
+    rows = iter(rows)
+    if not dtypes:
+        return rows
+    header = next(rows, None)
+    if header is None:
+        return iter(())
+    if dtypes == 'infer':
+        sample = list(itertools.islice(rows, sample_size))
+        rows = itertools.chain(sample, rows)
+        dtypes = infer_dtypes(header, sample, form)
+    if form == 'narrow':
+        body = _convert_narrow(rows, dtypes, empty, block_size)
+    else:
+        body = _convert_wide(header, rows, dtypes, empty, block_size)
+    return itertools.chain([header], body)
+
+
+def _blocks(rows, size):
+    while True:
+        block = list(itertools.islice(rows, size))
+        if not block:
+            return
+        yield block
+
+
+def _convert_wide(header, rows, dtypes, empty, block_size):
+    typed = [(j, name) for j, name in enumerate(header) if name in dtypes]
+    width = len(header)
+    for block in _blocks(rows, block_size):
+        if all(len(r) == width for r in block):
+            # convert whole columns of the transposed block
+            columns = list(zip(*block))
+            for j, name in typed:
+                columns[j] = convert_column(columns[j], dtypes[name], empty, name)
+            block = zip(*columns)
+        else:
+            # rows are copied rather than changing those we were given
+            block = [list(r) for r in block]
+            for j, name in typed:
+                cells = [r for r in block if len(r) > j]
+                values = convert_column([r[j] for r in cells], dtypes[name], empty, name)
+                for r, v in zip(cells, values):
+                    r[j] = v
+        for row in block:
+            yield row
+
+
+def _convert_narrow(rows, dtypes, empty, block_size):
+    for block in _blocks(rows, block_size):
+        variables = {}
+        for i, r in enumerate(block):
+            if len(r) >= 2 and r[-2] in dtypes:
+                variables.setdefault(r[-2], []).append(i)
+        for name, indices in variables.items():
+            values = convert_column([block[i][-1] for i in indices], dtypes[name], empty, name)
+            for i, v in zip(indices, values):
+                block[i] = tuple(block[i][:-1]) + (v,)
+        for row in block:
+            yield row
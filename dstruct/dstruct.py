@@ -3,7 +3,15 @@ import json
 from inspect import getmembers
 import types
 
-from .loader import Loader, FileLoader, JSONLoader, CSVLoader
+from .loader import (Loader, FileLoader, JSONLoader, JSONLinesLoader, CSVLoader,
+                     MultiFileLoader)
+from .paths import compile_paths, resolve_paths, compile_accessor
+from .columnar import map_arrays
+from .parallel import map_parallel, map_shards
+from .codegen import compile_update
+from .instrument import StructStats
+from .utils import LRUCache
+from .serialize import to_json as _to_json, dump_many
 
 # - - - - -
 # Utilities
@@ -13,10 +21,10 @@ class FieldError(Exception): pass
 
 class StructEncoder(json.JSONEncoder):
     def default(self, obj):
-        if not isinstance(obj, DataStruct):
+        if not isinstance(obj, BaseDataStruct):
             raise ValueError("Expected a DataStruct obj, not %r" % obj)
         else:
-            return obj._field_values.copy()
+            return obj._parsed_field_values()
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 # Base Descriptor Protocol (inspired by IPython's Traitlets)
@@ -83,13 +91,70 @@ class MetaHasDescriptors(type):
                 v.init_self(cls, k)
         # initialize the class which has
         # these struct members in its mro
-        for k, v in getmembers(cls):
-            if isinstance(v, BaseDescriptor):
-                v.init_cls(cls)
+        for k, v in cls._descriptor_members():
+            v.init_cls(cls)
+
+    def __setattr__(cls, name, value):
+        if isinstance(value, BaseDescriptor):
+            value.init_self(cls, name)
+            type.__setattr__(cls, name, value)
+            cls.reset_descriptors()
+        else:
+            type.__setattr__(cls, name, value)
+
+    def __delattr__(cls, name):
+        value = cls.__dict__.get(name)
+        type.__delattr__(cls, name)
+        if isinstance(value, BaseDescriptor):
+            cls.reset_descriptors()
+
+    def reset_descriptors(cls):
+        """Discard what has been cached about the descriptors of this class
+
+        This happens automatically when descriptors are set or deleted on the
+        class, and applies to its subclasses as well.
+        """
+        cls._descriptor_cache().clear()
+        for c in type.__subclasses__(cls):
+            c.reset_descriptors()
+
+    def _descriptor_cache(cls):
+        # a cache owned by this class - not one of its bases
+        try:
+            return cls.__dict__['_descriptors']
+        except KeyError:
+            cache = {}
+            type.__setattr__(cls, '_descriptors', cache)
+            return cache
+
+    def _descriptor_members(cls):
+        cache = cls._descriptor_cache()
+        try:
+            return cache['members']
+        except KeyError:
+            members = tuple((k, v) for k, v in getmembers(cls)
+                            if isinstance(v, BaseDescriptor))
+            cache['members'] = members
+            return members
+
+    def _instance_descriptors(cls):
+        # only descriptors which override `init_inst` need it called
+        cache = cls._descriptor_cache()
+        try:
+            return cache['instance']
+        except KeyError:
+            base = six.get_unbound_function(BaseDescriptor.init_inst)
+            members = tuple(v for k, v in cls._descriptor_members() if
+                six.get_unbound_function(type(v).init_inst) is not base)
+            cache['instance'] = members
+            return members
 
 
 class HasDescriptors(six.with_metaclass(MetaHasDescriptors, object)):
 
+    # subclasses have a __dict__ unless they declare slots
+    __slots__ = ()
+
     def __new__(cls, *args, **kwargs):
         new = super(HasDescriptors, cls).__new__
         if new is object.__new__:
@@ -100,9 +165,8 @@ class HasDescriptors(six.with_metaclass(MetaHasDescriptors, object)):
         return inst
 
     def setup_self(self, *args, **kwargs):
-        for k, v in getmembers(self.__class__):
-            if isinstance(v, BaseDescriptor):
-                v.init_inst(self)
+        for v in self.__class__._instance_descriptors():
+            v.init_inst(self)
 
 # - - - - - - - - - - - - - - - - -
 # Data Structures and Field Members
@@ -113,6 +177,8 @@ class dataparser(BaseDescriptor):
 
     _func = None
     info = 'data parser'
+    vectorized = False
+    cache = None
 
     def __init__(self, *names, **kwargs):
         """A decorator that creates parsers for the fields of a data structure
@@ -125,7 +191,10 @@ class dataparser(BaseDescriptor):
             Keyword arguments do not affect decorator logic. If this instance is not
             a decorator, then specify a parser with the keyword ``func=<callable>`` and
             whether it should be treated as a method type with ``method_type=<bool>``
-            (default: False).
+            (default: False). Declaring ``vectorized=True`` promises the parser also
+            accepts a NumPy array of raw values, and returns an array of parsed ones.
+            Results of pure parsers which aren't method types can be kept in an LRU
+            cache with ``cache=<int>`` (its maximum size) or ``cache=<LRUCache>``.
 
         Parsers accept one argument for raw values and return a parsed value.
         """
@@ -134,6 +203,13 @@ class dataparser(BaseDescriptor):
         b = kwargs.get('method_type', False)
         if not isinstance(b, bool):
             raise ValueError("The 'method_type' keyword must be a 'bool'")
+        self.vectorized = kwargs.get('vectorized', False)
+        cache = kwargs.get('cache')
+        if isinstance(cache, six.integer_types):
+            cache = LRUCache(cache)
+        elif cache is not None and not isinstance(cache, LRUCache):
+            raise ValueError("The 'cache' keyword must be an 'int' or 'LRUCache'")
+        self.cache = cache
         if f is not None:
             self._setup_parser(f, b)
 
@@ -150,6 +226,10 @@ class dataparser(BaseDescriptor):
             if method_type and not isinstance(func, types.FunctionType):
                 m = "Decorator cannot coerce %r to method type"
                 raise ValueError(m % func)
+            if self.cache is not None:
+                if method_type:
+                    raise ValueError("Method type parsers cannot be cached")
+                func = self.cache.memoize(func)
             self._func = func
         else:
             raise ValueError("Parser must be callable")
@@ -186,9 +266,59 @@ class dataparser(BaseDescriptor):
         else:
             return self.get(inst, cls)
 
+class _Unparsed(object):
+    """A raw value whose parsing is deferred until its field is accessed"""
+
+    __slots__ = ('raw', 'cache')
+
+    def __init__(self, raw, cache=True):
+        self.raw = raw
+        # whether the parsed value replaces this one
+        self.cache = cache
+
+
+class _RecordView(dict):
+    """The field values of a struct which are resolved from its raw record on access
+
+    Values which have been set (or cached) are kept in the dict itself. The
+    values of fields with parsers are returned as :class:`_Unparsed` values
+    for :meth:`DataField.get` to parse.
+    """
+
+    __slots__ = ('record', 'cache', 'accessors', 'parsers')
+
+    def __init__(self, record, accessors, parsers, cache=True):
+        self.record = record
+        self.accessors = accessors
+        self.parsers = parsers
+        self.cache = cache
+
+    def __missing__(self, name):
+        raw = self.accessors[name](self.record)
+        if name in self.parsers:
+            return _Unparsed(raw, self.cache)
+        if self.cache:
+            self[name] = raw
+        return raw
+
+    def __iter__(self):
+        for name, get in self.accessors.items():
+            if dict.__contains__(self, name):
+                yield name
+            else:
+                try:
+                    get(self.record)
+                except KeyError:
+                    continue
+                yield name
+
+
 class DataField(BaseDescriptor):
 
     parser = None
+    dtype = None
+    slot = None
+    lazy = None
     info = 'data field'
 
     def __init__(self, *path, **kwargs):
@@ -199,18 +329,29 @@ class DataField(BaseDescriptor):
         path: tuple
             The path to the value of this field in a data set. If no path is provided
             the path is assumed to be ``(self.this_name,)`` where ``self.this_name``
-            is the name of the attribute this field was defined under.
+            is the name of the attribute this field was defined under. Integers in
+            the path also index sequences, and slices fan out over their items (see
+            :mod:`dstruct.paths`).
         **kwargs:
             By explicitely claiming ``path=None``, no assumptions are made about the
             ``path`` meaning the whole data set is set as the value of this field.
             Asserting ``parser=<callable>`` creates a parser for this data field.
             Parser functions accept one argument for the raw value being set on the
-            field, and return a parsed value.
+            field, and return a parsed value. Such parsers may be declared with
+            ``vectorized=True``, and their results cached with ``cache_size=<int>``
+            (see :class:`dataparser`). With ``lazy=True`` the
+            raw value is kept, and only parsed when the field is first accessed
+            (by default this follows the ``lazy_parsing`` attribute of the struct).
+            Lastly, ``dtype`` is the NumPy data type of this field when records are
+            mapped to arrays.
         """
         self.path = path or kwargs.get('path', True)
+        self.dtype = kwargs.get('dtype')
+        self.lazy = kwargs.get('lazy')
         f = kwargs.get('parser')
         if f is not None:
-            self.setup_parser(f)
+            self.setup_parser(f, kwargs.get('vectorized', False),
+                              kwargs.get('cache_size'))
 
     def __call__(self, func):
         """Sets up a function as a `dataparser`"""
@@ -219,11 +360,14 @@ class DataField(BaseDescriptor):
         self.setup_parser(p)
         return self
 
-    def setup_parser(self, parser):
+    def setup_parser(self, parser, vectorized=False, cache_size=None):
         if self.parser is None:
             if not isinstance(parser, dataparser):
                 # parser is not setup as a method type
-                self.parser = dataparser(func=parser)
+                self.parser = dataparser(func=parser, vectorized=vectorized,
+                                         cache=cache_size)
+            elif cache_size is not None:
+                raise ValueError("The cache of a 'dataparser' is set when it's created")
             else:
                 self.parser = parser
         else:
@@ -242,10 +386,20 @@ class DataField(BaseDescriptor):
 
     def get(self, inst):
         try:
-            return inst._field_values[self.this_name]
-        except KeyError:
+            if self.slot is None:
+                value = inst._field_values[self.this_name]
+            else:
+                value = self.slot.__get__(inst, None)
+        except (KeyError, AttributeError):
             m = "The field '%s' has no data"
             raise FieldError(m % self.this_name)
+        if value.__class__ is _Unparsed:
+            # parse deferred values once
+            cache = value.cache
+            value = self.parse_value(inst, value.raw)
+            if cache:
+                self.set(inst, value)
+        return value
 
     def __get__(self, inst, cls=None):
         if inst is not None:
@@ -254,7 +408,10 @@ class DataField(BaseDescriptor):
             return self
 
     def set(self, inst, value):
-        inst._field_values[self.this_name] = value
+        if self.slot is None:
+            inst._field_values[self.this_name] = value
+        else:
+            self.slot.__set__(inst, value)
 
     def parse_value(self, inst, value):
         if self.this_name in inst._field_parsers:
@@ -265,8 +422,18 @@ class DataField(BaseDescriptor):
                 value = p(value)
         return value
 
+    def is_lazy(self, cls):
+        """Whether parsing this field's values is deferred for a struct"""
+        if self.lazy is None:
+            return cls.lazy_parsing
+        else:
+            return self.lazy
+
     def __set__(self, inst, value):
-        self.set(inst, self.parse_value(inst, value))
+        if self.is_lazy(inst) and self.this_name in inst._field_parsers:
+            self.set(inst, _Unparsed(value))
+        else:
+            self.set(inst, self.parse_value(inst, value))
 
 
 def datafield(*path, **kwargs):
@@ -293,54 +460,226 @@ def datafield(*path, **kwargs):
 
 class MetaStruct(MetaHasDescriptors):
 
+    def __new__(mcls, name, bases, classdict):
+        if not classdict.get('_compact', any(getattr(b, '_compact', False) for b in bases)):
+            return super(MetaStruct, mcls).__new__(mcls, name, bases, classdict)
+        # the values of compact structs' fields live in slots, which must
+        # be given names that are then taken back by the fields themselves
+        fields = dict((k, v) for k, v in classdict.items() if isinstance(v, DataField))
+        classdict = dict((k, v) for k, v in classdict.items() if k not in fields)
+        slots = classdict.get('__slots__', ())
+        if isinstance(slots, six.string_types):
+            slots = (slots,)
+        classdict['__slots__'] = tuple(slots) + tuple(fields)
+        cls = super(MetaStruct, mcls).__new__(mcls, name, bases, classdict)
+        for k, v in fields.items():
+            v.slot = cls.__dict__[k]
+            type.__setattr__(cls, k, v)
+        return cls
+
     def setup_class(cls, classdict):
         cls._field_paths = {}
         cls._field_parsers = {}
         super(MetaStruct, cls).setup_class(classdict)
-        temp_paths = {}
-        temp_parsers = {}
+        cls.setup_fields()
+        if cls._compact:
+            for k, v in cls.fields().items():
+                if v.slot is None:
+                    m = "The compact struct '%s' cannot have the non-compact field '%s'"
+                    raise FieldError(m % (cls.__name__, k))
+
+    def __setattr__(cls, name, value):
+        super(MetaStruct, cls).__setattr__(name, value)
+        if name in ('generate_update', 'lazy_parsing', 'instrumented'):
+            cls.reset_descriptors()
+
+    def reset_descriptors(cls):
+        cls.setup_fields()
+        super(MetaStruct, cls).reset_descriptors()
+
+    def setup_fields(cls):
+        """Gather the paths and parsers of this struct's fields from its mro"""
+        fields = {}
+        paths = {}
+        parsers = {}
         for c in cls.mro()[::-1]:
-            if issubclass(c.__class__, MetaStruct):
-                temp_paths.update(c._field_paths)
-                temp_parsers.update(c._field_parsers)
-        cls._field_paths = temp_paths
-        cls._field_parsers = temp_parsers
-
+            if isinstance(c, MetaStruct):
+                for k, v in c.__dict__.items():
+                    if isinstance(v, DataField):
+                        fields[k] = v
+                        paths[k] = v.path
+                        if v.parser is not None:
+                            parsers[k] = v.parser
+                    elif isinstance(v, dataparser):
+                        for n in v.names or ():
+                            parsers[n] = v
+        type.__setattr__(cls, '_field_paths', paths)
+        type.__setattr__(cls, '_field_parsers', parsers)
+        cls.compile_field_paths()
+        cls.compile_update(fields, parsers)
+
+    def compile_field_paths(cls):
+        """Compile the field paths of this struct into a shared lookup plan"""
+        type.__setattr__(cls, '_field_trie', compile_paths(cls._field_paths))
+
+    def compile_update(cls, fields, parsers):
+        """Give this struct an ``update`` method generated for its fields
+
+        Only structs which inherit the generic ``update`` method of
+        :class:`BaseDataStruct`, don't customize ``__setattr__``, and have
+        a true ``generate_update`` attribute get one - unless they're
+        ``instrumented``, in which case they get an instrumented one
+        whatever their other attributes are.
+        """
+        for c in cls.__mro__:
+            generic = c.__dict__.get('update')
+            if generic is not None and not getattr(generic, 'generated', False):
+                break
+        inherited = c is not cls and getattr(generic, 'generic', False)
+        stats = None
+        if inherited and getattr(cls, 'instrumented', False):
+            stats = StructStats(cls.__name__, fields)
+            update = compile_update(cls, fields, parsers, generic, stats)
+            type.__setattr__(cls, 'update', update)
+        elif (inherited and getattr(cls, 'generate_update', False) and
+                cls.__setattr__ is object.__setattr__):
+            update = compile_update(cls, fields, parsers, generic)
+            type.__setattr__(cls, 'update', update)
+        elif getattr(cls.__dict__.get('update'), 'generated', False):
+            type.__delattr__(cls, 'update')
+        type.__setattr__(cls, '_field_stats', stats)
+
+
+class BaseDataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
+    """The behavior shared by :class:`DataStruct` and :class:`CompactDataStruct`
+
+    Its instances have no ``__dict__`` - the values of their fields are stored
+    in the ``_field_values`` slot (or by compact structs, in a slot per field).
+    """
 
-class DataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
+    __slots__ = ('_field_values',)
+    _compact = False
+    # whether subclasses get an update method generated for their fields
+    generate_update = True
+    # whether parsing is deferred until fields are accessed
+    lazy_parsing = False
+    # whether mapping records is measured (see dstruct.instrument)
+    instrumented = False
 
     def setup_self(self, *args, **kwargs):
         self._field_values = {}
-        super(DataStruct, self).setup_self(*args, **kwargs)
+        super(BaseDataStruct, self).setup_self(*args, **kwargs)
 
     def __init__(self, data=None):
         self.update(data)
 
     def __getitem__(self, name):
-        f = getattr(self, name, None)
+        f = getattr(type(self), name, None)
         if isinstance(f, DataField):
             return f.__get__(self)
         else:
             raise FieldError("No field named '%s'" % name)
 
     def __setitem__(self, name, value):
-        f = getattr(self, name, None)
+        f = getattr(type(self), name, None)
         if isinstance(f, DataField):
             f.__set__(self, value)
         else:
             raise FieldError("No field named '%s'" % name)
 
     def update(self, data=None):
+        """Parse the values of this struct's fields from raw data"""
         if data is not None:
-            for f, p in self._field_paths.items():
-                _data = data
-                for k in p:
-                    if isinstance(_data, dict) and k in _data:
-                        _data = _data[k]
-                    else:
-                        break
-                else:
-                    setattr(self, f, _data)
+            for f, v in resolve_paths(self._field_trie, data):
+                setattr(self, f, v)
+
+    # replaced by a generated method in subclasses (see MetaStruct.compile_update)
+    update.generic = True
+
+    @classmethod
+    def map_many(cls, records, *args, **kwargs):
+        """Lazily map raw records onto new instances of this struct
+
+        Parameters
+        ----------
+        records: iterable
+            The raw data for each instance.
+        *args, **kwargs:
+            Passed to the constructor of each instance before it is updated
+            with its record. Structs which don't override ``__new__``,
+            ``__init__`` or ``setup_self`` skip the constructor altogether.
+
+        Returns a generator of struct instances.
+        """
+        new = cls._instance_factory(*args, **kwargs)
+        for data in records:
+            inst = new()
+            inst.update(data)
+            yield inst
+
+    @classmethod
+    def map_loader(cls, loader, *args, **kwargs):
+        """Lazily map each record a :class:`Loader` provides onto a new instance
+
+        Accepts the same arguments as :meth:`DataStruct.map_many`, except that
+        records are read from the loader as they're needed.
+        """
+        if not isinstance(loader, Loader):
+            m = "Expected an instance of '%s' got: '%s' instead"
+            raise ValueError(m % (Loader.__name__, repr(loader)))
+        return cls.map_many(loader.iter_records(), *args, **kwargs)
+
+    @classmethod
+    def map_columns(cls, records, *args, **kwargs):
+        """Map raw records onto lists of values for each field of this struct
+
+        Accepts the same arguments as :meth:`DataStruct.map_many`, but returns
+        a dict of field names to lists with one value per record. Fields which
+        are absent from a record are ``None`` in that record's place.
+        """
+        names = tuple(cls._field_paths)
+        columns = tuple([] for n in names)
+        for inst in cls.map_many(records, *args, **kwargs):
+            values = inst._parsed_field_values()
+            for n, c in zip(names, columns):
+                c.append(values.get(n))
+        return dict(zip(names, columns))
+
+    @classmethod
+    def map_arrays(cls, records, *args, **kwargs):
+        """Map raw records onto NumPy arrays for each field of this struct
+
+        Accepts the same arguments as :meth:`DataStruct.map_many`, but returns a
+        dict of field names to arrays - see :func:`dstruct.columnar.map_arrays`.
+        """
+        return map_arrays(cls, records, *args, **kwargs)
+
+    @classmethod
+    def map_parallel(cls, records, workers=None, chunk_size=1000, ordered=True,
+                     stats=None, args=(), kwargs=None, executor=None):
+        """Lazily map raw records onto new instances of this struct in worker processes
+
+        See :func:`dstruct.parallel.map_parallel` for a description of the arguments.
+        """
+        return map_parallel(cls, records, workers, chunk_size, ordered,
+                            stats, args, kwargs, executor)
+
+    @classmethod
+    def _instance_factory(cls, *args, **kwargs):
+        """Return a function which creates empty instances of this struct"""
+        unbound = six.get_unbound_function
+        default = (not (args or kwargs) and
+                   unbound(cls.__init__) is unbound(BaseDataStruct.__init__) and
+                   unbound(cls.setup_self) in (unbound(BaseDataStruct.setup_self),
+                                               unbound(CompactDataStruct.setup_self)) and
+                   cls.__new__ is HasDescriptors.__new__)
+        if not default:
+            return lambda: cls(*args, **kwargs)
+        def new():
+            inst = object.__new__(cls)
+            inst.setup_self()
+            return inst
+        return new
 
     @classmethod
     def has_field(cls, name):
@@ -352,12 +691,21 @@ class DataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
 
     @classmethod
     def fields(cls):
-        return {k:v for k, v in getmembers(cls) if isinstance(v, DataField)}
+        cache = cls._descriptor_cache()
+        try:
+            fields = cache['fields']
+        except KeyError:
+            fields = {k:v for k, v in cls._descriptor_members()
+                      if isinstance(v, DataField)}
+            cache['fields'] = fields
+        return fields.copy()
 
     def add_fields(self, **fields):
         """Add new data fields to this struct instance"""
+        # don't change the layout of this instance
+        classdict = dict(fields, __slots__=())
         self.__class__ = type(self.__class__.__name__,
-                            (self.__class__,), fields)
+                            (self.__class__,), classdict)
         for k, v in fields.items():
             v.init_inst(self)
 
@@ -374,7 +722,7 @@ class DataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
 
     def set_field(self, name, value):
         """Forcibly sets field values without parsing"""
-        f = getattr(self, name, None)
+        f = getattr(type(self), name, None)
         if isinstance(f, DataField):
             f.set(self, value)
         else:
@@ -393,18 +741,77 @@ class DataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
 
     @classmethod
     def parsers(cls):
-        d = {}
-        # assumes no conflicts exist
-        for k, v in getmembers(cls):
-            if isinstance(v, dataparser):
-                d[k] = v
-            elif isinstance(v, DataField) and v.parser is not None:
-                d[k] = v.parser
-        return d
+        cache = cls._descriptor_cache()
+        try:
+            d = cache['parsers']
+        except KeyError:
+            d = {}
+            # assumes no conflicts exist
+            for k, v in cls._descriptor_members():
+                if isinstance(v, dataparser):
+                    d[k] = v
+                elif isinstance(v, DataField) and v.parser is not None:
+                    d[k] = v.parser
+            cache['parsers'] = d
+        return d.copy()
+
+    def _parsed_field_values(self):
+        """Get the values of this struct's fields, parsing any which were deferred"""
+        values = self._field_values
+        cls = type(self)
+        if values.__class__ is _RecordView:
+            return dict((k, getattr(cls, k).get(self)) for k in values)
+        if cls._lazy_fields():
+            unparsed = [k for k, v in values.items() if v.__class__ is _Unparsed]
+            for k in unparsed:
+                values[k] = getattr(cls, k).get(self)
+        return values
+
+    @classmethod
+    def _lazy_fields(cls):
+        cache = cls._descriptor_cache()
+        try:
+            return cache['lazy']
+        except KeyError:
+            parsers = cls._field_parsers
+            lazy = tuple(k for k, v in cls.fields().items()
+                         if k in parsers and v.is_lazy(cls))
+            cache['lazy'] = lazy
+            return lazy
+
+    @classmethod
+    def parser_cache_info(cls):
+        """Return the statistics of the caches of this struct's parsers by field name"""
+        return dict((k, p.cache.info()) for k, p in cls._field_parsers.items()
+                    if p.cache is not None)
+
+    @classmethod
+    def field_stats(cls):
+        """Return the :class:`dstruct.instrument.StructStats` of an instrumented struct
+
+        Setting the ``instrumented`` attribute of a struct to true gives it an
+        ``update`` method which counts the records mapped, the fields found in
+        them and the calls of each field's parser and their durations. Those
+        statistics are reset whenever the struct's fields change. Records
+        mapped in other processes, or as views, aren't counted. Returns
+        ``None`` if the struct isn't instrumented.
+        """
+        return cls._field_stats
+
+    @classmethod
+    def clear_parser_caches(cls):
+        """Clear the caches of this struct's parsers"""
+        for p in cls._field_parsers.values():
+            if p.cache is not None:
+                p.cache.clear()
 
     def __iter__(self):
         return iter(self._field_values)
 
+    def to_json(self, indent=None, sort_keys=False, backend=None):
+        """Serialize this struct to a JSON string - see :func:`dstruct.serialize.to_json`"""
+        return _to_json(self, indent, sort_keys, backend)
+
     def __str__(self):
         return StructEncoder(sort_keys=True, indent=4, separators=(',', ': ')).encode(self)
 
@@ -412,14 +819,119 @@ class DataStruct(six.with_metaclass(MetaStruct, HasDescriptors)):
         return StructEncoder().encode(self)
 
     def __eq__(self, other):
-        if isinstance(other, DataStruct):
-            return self._field_values == other._field_values
+        if isinstance(other, BaseDataStruct):
+            return self._parsed_field_values() == other._parsed_field_values()
         else:
-            return self._field_values == other
+            return self._parsed_field_values() == other
+
+
+class DataStruct(BaseDataStruct):
+    """A data structure whose fields are parsed from raw data
+
+    Unlike those of :class:`BaseDataStruct`, its instances have a ``__dict__``.
+    """
+
+    @classmethod
+    def view(cls, record, cache=True, args=(), kwargs=None):
+        """Create an instance of this struct which resolves its fields from a record on access
+
+        Parameters
+        ----------
+        record: any
+            The raw data of the instance. A reference to it is kept instead of
+            copying the values of fields from it, so it shouldn't be mutated.
+        cache: bool (default: True)
+            Whether values are kept once they've been resolved (and parsed),
+            rather than being resolved again each time they're accessed.
+        args, kwargs:
+            Passed to the constructor of the instance (see :meth:`map_many`).
+
+        Views behave like other instances - assigning a value to one of their
+        fields overrides the value in the record. Use :meth:`materialize` to
+        resolve every field and release the record.
+        """
+        return next(cls.map_views((record,), cache, args, kwargs))
+
+    @classmethod
+    def map_views(cls, records, cache=True, args=(), kwargs=None):
+        """Lazily create views of many records - see :meth:`DataStruct.view`"""
+        new = cls._instance_factory(*args, **(kwargs or {}))
+        accessors = cls._field_accessors()
+        parsers = cls._field_parsers
+        for record in records:
+            inst = new()
+            inst._field_values = _RecordView(record, accessors, parsers, cache)
+            yield inst
+
+    def materialize(self):
+        """Resolve the values of every field, so this struct no longer refers to its record"""
+        self._field_values = self._parsed_field_values()
+        return self
+
+    @classmethod
+    def _field_accessors(cls):
+        cache = cls._descriptor_cache()
+        try:
+            return cache['accessors']
+        except KeyError:
+            accessors = dict((k, compile_accessor(p)) for k, p in cls._field_paths.items())
+            cache['accessors'] = accessors
+            return accessors
+
+
+class CompactDataStruct(BaseDataStruct):
+    """A data structure which keeps the values of its fields in slots
+
+    The subclasses of this struct get a slot for each of their fields, and no
+    ``__dict__`` unless they declare one, making their instances far smaller.
+    Every field of a compact struct must be defined on a compact struct, and
+    fields cannot be added to its instances.
+    """
+
+    __slots__ = ()
+    _compact = True
+
+    def setup_self(self, *args, **kwargs):
+        # skip creating a dict of field values
+        HasDescriptors.setup_self(self, *args, **kwargs)
+
+    @property
+    def _field_values(self):
+        values = {}
+        for k, slot in self._field_slots():
+            try:
+                values[k] = slot.__get__(self, None)
+            except AttributeError:
+                pass
+        return values
+
+    @classmethod
+    def _field_slots(cls):
+        cache = cls._descriptor_cache()
+        try:
+            return cache['slots']
+        except KeyError:
+            slots = tuple((k, v.slot) for k, v in cls.fields().items())
+            cache['slots'] = slots
+            return slots
+
+    def __getstate__(self):
+        return self._parsed_field_values()
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            self.set_field(k, v)
+
+    def add_fields(self, **fields):
+        m = "Fields cannot be added to the compact struct '%s'"
+        raise FieldError(m % type(self).__name__)
 
 
 class LoadedDataStruct(DataStruct):
 
+    # a dstruct.cache.ParseCache of what file loaders load for this struct
+    parse_cache = None
+
     def __init__(self, loader, *a, **kw):
         """Load, and map raw data onto the defined fields of this dict-like structure"""
         if isinstance(loader, Loader):
@@ -434,7 +946,26 @@ class LoadedDataStruct(DataStruct):
         super(LoadedDataStruct, self).__init__(self.read_from_loader())
 
     def read_from_loader(self):
-        return self._loader.load()
+        loader = self._loader
+        if self.parse_cache is not None and isinstance(loader, FileLoader) and loader.cache is None:
+            return self.parse_cache.load(loader)
+        return loader.load()
+
+    @classmethod
+    def map_shards(cls, filename, path=None, shards=None, workers=None, ordered=True,
+                   columns=False, stats=None, loader_kwargs=None, **kwargs):
+        """Map byte range shards of one file onto this struct in worker processes
+
+        The file is read by this struct's loader - see
+        :func:`dstruct.parallel.map_shards` for a description of the arguments.
+        """
+        return map_shards(cls, filename, path, shards, workers, ordered, columns,
+                          stats, loader_kwargs=loader_kwargs, **kwargs)
+
+    @classmethod
+    def _instance_factory(cls, *args, **kwargs):
+        # structs mapped from individual records have no loader
+        return lambda: cls.__new__(cls)
 
 # - - - - - - - - - - - - - - - - - - - -
 # Data Structions From Predefined Loaders
@@ -448,6 +979,23 @@ class DataStructFromJSON(LoadedDataStruct):
         l = self._loader(filename, path)
         super(DataStructFromJSON, self).__init__(l)
 
+class DataStructFromJSONLines(LoadedDataStruct):
+
+    _loader = JSONLinesLoader
+
+    def __init__(self, filename, path=None, **kwargs):
+        """Map the list of documents in a JSON Lines file onto this struct"""
+        l = self._loader(filename, path, **kwargs)
+        super(DataStructFromJSONLines, self).__init__(l)
+
+    @classmethod
+    def stream(cls, filename, path=None, **kwargs):
+        """Lazily map each line of a JSON Lines file onto a new instance of this struct
+
+        Keyword arguments are passed to :class:`dstruct.loader.JSONLinesLoader`.
+        """
+        return cls.map_loader(cls._loader(filename, path, **kwargs))
+
 class DataStructFromCSV(LoadedDataStruct):
 
     _loader = CSVLoader
@@ -455,3 +1003,11 @@ class DataStructFromCSV(LoadedDataStruct):
     def __init__(self, filename, path=None, dialect='excel', **fmtparams):
         l = self._loader(filename, path, dialect, **fmtparams)
         super(DataStructFromCSV, self).__init__(l)
+
+    @classmethod
+    def stream(cls, filename, path=None, dialect='excel', **fmtparams):
+        """Lazily map each row of a wide form CSV table onto a new instance of this struct
+
+        Each row is a dict of column names to values - see :meth:`CSVLoader.iter_records`.
+        """
+        return cls.map_loader(cls._loader(filename, path, dialect, **fmtparams))
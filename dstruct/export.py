@@ -0,0 +1,347 @@
+"""Columnar files of mapped data structures
+
+Structs are written in row groups - a column per field. The default format is
+a directory holding a ``schema.json`` file and a ``.npy`` file per column of
+each row group, which are memory mapped when read. Parquet files are written
+and read instead when the path ends with ``.parquet`` (this requires pyarrow).
+"""
+
+import os
+import json
+import itertools
+
+import six
+
+from .utils import missing
+from .paths import format_path
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+SCHEMA_FILE = 'schema.json'
+
+# python types stored as typed arrays when fields have no dtype
+_NATIVE_TYPES = (bool, float, complex, six.text_type, bytes) + six.integer_types
+
+
+def write_structs(path, structs, cls=None, row_group_size=65536):
+    """Write a stream of structs to a columnar file
+
+    Parameters
+    ----------
+    path: str
+        The file (or directory) to write.
+    structs: iterable
+        The structs to write. They're consumed one row group at a time.
+    cls: DataStruct subclass or None
+        The struct whose fields define the columns of the file. By default
+        it's the class of the first struct.
+    row_group_size: int
+        The number of structs in each row group.
+
+    Returns the number of structs written.
+    """
+    structs = iter(structs)
+    if cls is None:
+        try:
+            first = next(structs)
+        except StopIteration:
+            raise ValueError("The class of the structs must be given if there are none")
+        cls = type(first)
+        structs = itertools.chain([first], structs)
+    with ColumnWriter(path, cls, row_group_size) as w:
+        w.write(structs)
+    return w.rows
+
+
+def write_records(path, cls, records, *args, **kwargs):
+    """Map raw records onto a struct and write them to a columnar file
+
+    Arguments are passed to :meth:`DataStruct.map_many`.
+    """
+    return write_structs(path, cls.map_many(records, *args, **kwargs), cls)
+
+
+def read_structs(path, cls, *args, **kwargs):
+    """Lazily read structs from a columnar file - see :meth:`ColumnReader.iter_structs`"""
+    return ColumnReader(path).iter_structs(cls, *args, **kwargs)
+
+
+class ColumnWriter(object):
+
+    def __init__(self, path, cls, row_group_size=65536):
+        """Write structs to a columnar file in row groups
+
+        Parameters
+        ----------
+        path: str
+            The file (or directory) to write.
+        cls: DataStruct subclass
+            The struct whose fields define the schema of the file.
+        row_group_size: int
+            The number of structs buffered before they're written as a row group.
+        """
+        if numpy is None:
+            raise ImportError("Writing columnar files requires numpy")
+        self.path = path
+        self.parquet = _is_parquet(path)
+        if self.parquet and pyarrow is None:
+            raise ImportError("Writing parquet files requires pyarrow")
+        self.cls = cls
+        self.row_group_size = row_group_size
+        self.fields = sorted(cls.fields().items())
+        self.schema = {'struct': cls.__name__, 'fields': [
+            {'name': k, 'path': _json_path(f.path), 'dtype': _dtype_name(f.dtype)}
+            for k, f in self.fields], 'row_groups': []}
+        self.rows = 0
+        self._buffer = []
+        self._parquet_writer = None
+        self._encodings = {}
+        if not self.parquet and not os.path.isdir(path):
+            os.makedirs(path)
+
+    def write(self, structs):
+        """Buffer structs, writing a row group whenever it's full"""
+        for s in structs:
+            self._buffer.append(s._parsed_field_values())
+            if len(self._buffer) == self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered structs as a row group"""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        columns = {}
+        for k, f in self.fields:
+            columns[k] = [r.get(k, missing) for r in rows]
+        if self.parquet:
+            self._write_parquet(columns)
+        else:
+            self._write_npy(columns)
+        self.rows += len(rows)
+
+    def _write_npy(self, columns):
+        group = 'rowgroup-%05i' % len(self.schema['row_groups'])
+        os.mkdir(os.path.join(self.path, group))
+        meta = {'name': group, 'rows': len(columns[self.fields[0][0]]) if self.fields else 0,
+                'columns': {}}
+        for k, f in self.fields:
+            array, mask, encoding = _encode_column(columns[k], f.dtype)
+            numpy.save(os.path.join(self.path, group, k + '.npy'), array)
+            if mask is not None:
+                numpy.save(os.path.join(self.path, group, k + '.mask.npy'), mask)
+            meta['columns'][k] = {'encoding': encoding, 'masked': mask is not None}
+        self.schema['row_groups'].append(meta)
+
+    def _write_parquet(self, columns):
+        # the encoding of each column is fixed by the first row group
+        first = self._parquet_writer is None
+        schema = None if first else self._parquet_writer.schema
+        arrays = []
+        for k, f in self.fields:
+            encoding = None if first else self._encodings[k]
+            array, mask, encoding = _encode_column(columns[k], f.dtype, encoding)
+            array = pyarrow.array(array, mask=mask)
+            if first:
+                self._encodings[k] = encoding
+            elif mask is None or not mask.all():
+                t = schema.field(k).type
+                if encoding != self._encodings[k] or array.type != t:
+                    m = ("The values of the field %r in row group %i can't be stored as %s like "
+                         "those of the first - give the field a dtype, or use larger row groups")
+                    raise ValueError(m % (k, self.rows // self.row_group_size, t))
+            arrays.append(array)
+        names = [k for k, f in self.fields]
+        if first:
+            table = pyarrow.Table.from_arrays(arrays, names=names)
+            fields = [dict(f, encoding=self._encodings[f['name']])
+                      for f in self.schema['fields']]
+            metadata = {b'dstruct': json.dumps(fields).encode('utf-8')}
+            table = table.replace_schema_metadata(metadata)
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            # columns without values in this row group are cast from their placeholders
+            table = pyarrow.Table.from_arrays(
+                [a.cast(t) for a, t in zip(arrays, schema.types)], schema=schema)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        """Write any buffered structs and finish the file"""
+        self.flush()
+        if self.parquet:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+        else:
+            with open(os.path.join(self.path, SCHEMA_FILE), 'w') as f:
+                json.dump(self.schema, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnReader(object):
+
+    def __init__(self, path, mmap=True):
+        """Read the row groups of a columnar file written by :class:`ColumnWriter`
+
+        Parameters
+        ----------
+        path: str
+            The file (or directory) to read.
+        mmap: bool (default: True)
+            Whether the file's columns are memory mapped, rather than read.
+        """
+        if numpy is None:
+            raise ImportError("Reading columnar files requires numpy")
+        self.path = path
+        self.mmap = mmap
+        self.parquet = _is_parquet(path)
+        if self.parquet:
+            if pyarrow is None:
+                raise ImportError("Reading parquet files requires pyarrow")
+            self._file = pyarrow.parquet.ParquetFile(path, memory_map=mmap)
+            self.fields = json.loads(self._file.schema_arrow.metadata[b'dstruct'].decode('utf-8'))
+            self.row_groups = self._file.num_row_groups
+        else:
+            with open(os.path.join(path, SCHEMA_FILE)) as f:
+                schema = json.load(f)
+            self.fields = schema['fields']
+            self._groups = schema['row_groups']
+            self.row_groups = len(self._groups)
+
+    def __len__(self):
+        if self.parquet:
+            return self._file.metadata.num_rows
+        return sum(g['rows'] for g in self._groups)
+
+    def read_columns(self, index):
+        """Return the arrays of a row group, and their masks of absent values
+
+        Returns a dict of field names to ``(array, mask)`` pairs. The mask is
+        ``None`` if every struct in the row group had a value for the field.
+        Columns of values numpy can't represent hold their JSON encodings.
+        """
+        names = [f['name'] for f in self.fields]
+        if self.parquet:
+            table = self._file.read_row_group(index)
+            columns = {}
+            for n in names:
+                c = table.column(n)
+                mask = None
+                if c.null_count:
+                    mask = numpy.asarray(c.is_null().to_numpy(zero_copy_only=False))
+                columns[n] = (numpy.asarray(c.to_numpy(zero_copy_only=False)), mask)
+            return columns
+        group = self._groups[index]
+        directory = os.path.join(self.path, group['name'])
+        mode = 'r' if self.mmap else None
+        columns = {}
+        for n in names:
+            array = numpy.load(os.path.join(directory, n + '.npy'), mmap_mode=mode)
+            mask = None
+            if group['columns'][n]['masked']:
+                mask = numpy.load(os.path.join(directory, n + '.mask.npy'), mmap_mode=mode)
+            columns[n] = (array, mask)
+        return columns
+
+    def _encodings(self, index):
+        if self.parquet:
+            return dict((f['name'], f['encoding']) for f in self.fields)
+        return dict((n, c['encoding']) for n, c in self._groups[index]['columns'].items())
+
+    def iter_structs(self, cls, *args, **kwargs):
+        """Lazily create structs from the rows of this file
+
+        Parameters
+        ----------
+        cls: DataStruct subclass
+            The struct each row is set on (without parsing). Columns which
+            aren't fields of the struct are ignored.
+        *args, **kwargs:
+            Used to create each struct (see :meth:`DataStruct.map_many`).
+
+        Only one row group, and a slice of its rows, is read at a time.
+        """
+        fields = cls.fields()
+        new = cls._instance_factory(*args, **kwargs)
+        for i in range(self.row_groups):
+            columns = self.read_columns(i)
+            encodings = self._encodings(i)
+            setters = [(n, fields[n].set) for n in sorted(columns) if n in fields]
+            rows = len(columns[setters[0][0]][0]) if setters else 0
+            for start in range(0, rows, 1024):
+                stop = min(start + 1024, rows)
+                values = []
+                for n, s in setters:
+                    array, mask = columns[n]
+                    chunk = array[start:stop].tolist()
+                    if mask is None:
+                        absent = [False] * len(chunk)
+                    else:
+                        absent = mask[start:stop].tolist()
+                    if encodings.get(n) == 'json':
+                        chunk = [None if a else json.loads(v) for v, a in zip(chunk, absent)]
+                    values.append((s, chunk, absent))
+                for j in range(stop - start):
+                    inst = new()
+                    for s, chunk, absent in values:
+                        if not absent[j]:
+                            s(inst, chunk[j])
+                    yield inst
+
+
+def _is_parquet(path):
+    return path.endswith('.parquet')
+
+
+def _json_path(path):
+    # slices are written like "[1:]" and "[*]"
+    return [format_path([k]) if isinstance(k, slice) else k for k in path]
+
+
+def _dtype_name(dtype):
+    if dtype is None:
+        return None
+    return numpy.dtype(dtype).str if numpy is not None else str(dtype)
+
+
+def _encode_column(column, dtype, encoding=None):
+    # returns an array of the present values (zero where absent),
+    # a mask of the absent values (or None), and their encoding
+    mask = numpy.fromiter((v is missing for v in column), bool, len(column))
+    present = [v for v in column if v is not missing] if mask.any() else column
+    array = None
+    if encoding == 'json':
+        pass
+    elif dtype is not None:
+        array = numpy.array(present, dtype)
+    elif len(set(type(v) for v in present)) == 1 and isinstance(present[0], _NATIVE_TYPES):
+        array = numpy.array(present)
+        if array.dtype.kind == 'O' or array.ndim != 1:
+            # like integers beyond 64 bits
+            array = None
+    if array is None:
+        array = numpy.array([json.dumps(v) for v in present], six.text_type)
+        encoding = 'json'
+    else:
+        encoding = 'native'
+    if array.dtype.kind == 'O':
+        raise ValueError("Columns must not have an object dtype")
+    if present is column:
+        return array, None, encoding
+    full = numpy.zeros(len(column), array.dtype)
+    full[~mask] = array
+    return full, mask, encoding
@@ -0,0 +1,274 @@
+"""Opt-in statistics of how structs map records and loaders read files
+
+A struct whose ``instrumented`` attribute is true gets an ``update`` method
+generated with counters and timers inlined (see
+:func:`dstruct.codegen.compile_update`), which records a :class:`StructStats`
+available from its ``field_stats`` method. Structs which aren't instrumented
+keep their usual ``update`` method, so the counters cost nothing until then.
+Loaders record a :class:`LoaderStats` when their ``stats`` attribute is given
+one.
+
+Both kinds of statistics can be converted into dicts, printed as a table, or
+passed to :class:`pstats.Stats` like a profile made with :mod:`cProfile`::
+
+    pstats.Stats(Event.field_stats()).sort_stats('tottime').print_stats()
+"""
+
+from __future__ import print_function, division
+
+import sys
+import time
+import random
+from collections import OrderedDict
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class FieldStats(object):
+
+    def __init__(self, name, samples=10000):
+        """The statistics of one field of an instrumented struct
+
+        Parameters
+        ----------
+        name: str
+            The name of the field.
+        samples: int
+            The number of parser call durations kept for estimating percentiles.
+            Once there are more calls, a uniform sample of them is kept.
+        """
+        self.name = name
+        self.samples = samples
+        self.clear()
+
+    def clear(self):
+        """Reset every count and duration"""
+        # records whose path led to a value for the field
+        self.hits = 0
+        # values whose parsing was deferred (by lazy fields)
+        self.deferred = 0
+        self.parser_calls = 0
+        self.parser_seconds = 0.0
+        self.durations = []
+
+    def add_parse(self, seconds):
+        """Record the duration of one call of the field's parser"""
+        self.parser_calls += 1
+        self.parser_seconds += seconds
+        if len(self.durations) < self.samples:
+            self.durations.append(seconds)
+        else:
+            # reservoir sampling keeps each duration with equal probability
+            i = random.randrange(self.parser_calls)
+            if i < self.samples:
+                self.durations[i] = seconds
+
+    def percentile(self, q):
+        """Estimate a percentile (from 0 to 100) of parser call durations in seconds"""
+        if not self.durations:
+            return None
+        durations = sorted(self.durations)
+        return durations[min(len(durations) - 1, int(len(durations) * q / 100))]
+
+    def to_dict(self, records):
+        """Describe this field's statistics, given the number of records mapped"""
+        return OrderedDict([
+            ('hits', self.hits),
+            ('missing', records - self.hits),
+            ('deferred', self.deferred),
+            ('parser_calls', self.parser_calls),
+            ('parser_seconds', self.parser_seconds),
+            ('parser_mean_seconds', (self.parser_seconds / self.parser_calls
+                                     if self.parser_calls else None)),
+            ('parser_p50_seconds', self.percentile(50)),
+            ('parser_p90_seconds', self.percentile(90)),
+            ('parser_p99_seconds', self.percentile(99)),
+        ])
+
+
+class StructStats(object):
+
+    def __init__(self, name, fields, samples=10000):
+        """The statistics of an instrumented struct's ``update`` method
+
+        Parameters
+        ----------
+        name: str
+            The name of the struct.
+        fields: iterable of str
+            The names of the struct's fields.
+        samples: int
+            The number of parser call durations kept per field.
+        """
+        self.name = name
+        self.fields = OrderedDict((n, FieldStats(n, samples)) for n in sorted(fields))
+        self.clear()
+
+    def clear(self):
+        """Reset the statistics of the struct and each of its fields"""
+        # the number of records mapped, and the time spent doing so
+        self.records = 0
+        self.seconds = 0.0
+        for f in self.fields.values():
+            f.clear()
+
+    def to_dict(self):
+        """Describe these statistics as a dict of JSON serializable values"""
+        return OrderedDict([
+            ('struct', self.name),
+            ('records', self.records),
+            ('seconds', self.seconds),
+            ('fields', OrderedDict((n, f.to_dict(self.records))
+                                   for n, f in self.fields.items())),
+        ])
+
+    def report(self, out=sys.stdout, sort='parser_seconds'):
+        """Print a table of the statistics of each field
+
+        Fields are sorted by one of the keys given by :meth:`to_dict`, in
+        descending order.
+        """
+        fields = self.to_dict()['fields']
+        print('%s: %i records in %.6fs' % (self.name, self.records, self.seconds), file=out)
+        print('  %-24s %10s %10s %10s %10s %12s %10s %10s %10s' % (
+            'field', 'hits', 'missing', 'deferred', 'parses', 'parse s',
+            'mean us', 'p50 us', 'p99 us'), file=out)
+        for name, f in sorted(fields.items(), key=lambda i: i[1][sort] or 0, reverse=True):
+            print('  %-24s %10i %10i %10i %10i %12.6f %10s %10s %10s' % (
+                name, f['hits'], f['missing'], f['deferred'], f['parser_calls'],
+                f['parser_seconds'], _microseconds(f['parser_mean_seconds']),
+                _microseconds(f['parser_p50_seconds']),
+                _microseconds(f['parser_p99_seconds'])), file=out)
+
+    def create_stats(self):
+        """Set ``stats`` to a profile of ``update`` and its parsers, as :mod:`pstats` reads them
+
+        Each parser is a function called by ``update`` - whose own time
+        is that spent resolving paths and setting values.
+        """
+        update = ('<%s>' % self.name, 0, 'update')
+        parsed = 0.0
+        self.stats = {}
+        for n, f in self.fields.items():
+            if f.parser_calls:
+                parsed += f.parser_seconds
+                calls = (f.parser_calls, f.parser_calls, f.parser_seconds, f.parser_seconds)
+                self.stats[('<%s>' % self.name, 0, n)] = calls + ({update: calls},)
+        self.stats[update] = (self.records, self.records, max(self.seconds - parsed, 0.0),
+                              self.seconds, {})
+
+
+class LoaderStats(object):
+
+    def __init__(self):
+        """The time a :class:`dstruct.loader.FileLoader` spends loading files
+
+        Time spent reading from files (and decompressing them) is separated
+        from that spent decoding what was read - memory mapped files are read
+        as they're decoded, so for them it all counts as decoding.
+        """
+        self.clear()
+
+    def clear(self):
+        """Reset every count and duration"""
+        self.loads = 0
+        # the length of what was read (in characters, for files read as text)
+        self.bytes = 0
+        self.read_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def measure_load(self, read, filepath):
+        """Call ``read(filepath)``, recording the time spent on it"""
+        start = timer()
+        reading = self.read_seconds
+        try:
+            return read(filepath)
+        finally:
+            self.loads += 1
+            seconds = timer() - start
+            self.decode_seconds += max(seconds - (self.read_seconds - reading), 0.0)
+
+    def to_dict(self):
+        """Describe these statistics as a dict of JSON serializable values"""
+        return OrderedDict([
+            ('loads', self.loads),
+            ('bytes', self.bytes),
+            ('read_seconds', self.read_seconds),
+            ('decode_seconds', self.decode_seconds),
+        ])
+
+    def report(self, out=sys.stdout):
+        """Print a summary of these statistics"""
+        print('%i loads of %i bytes: %.6fs reading, %.6fs decoding' % (
+            self.loads, self.bytes, self.read_seconds, self.decode_seconds), file=out)
+
+    def create_stats(self):
+        """Set ``stats`` to a profile of loading, as :mod:`pstats` reads them"""
+        load = ('<loader>', 0, 'load')
+        read = ('<loader>', 0, 'read')
+        self.stats = {
+            load: (self.loads, self.loads, self.decode_seconds,
+                   self.decode_seconds + self.read_seconds, {}),
+            read: (self.loads, self.loads, self.read_seconds, self.read_seconds,
+                   {load: (self.loads, self.loads, self.read_seconds, self.read_seconds)}),
+        }
+
+
+class TimedFile(object):
+    """A file whose reads are timed by a :class:`LoaderStats`"""
+
+    def __init__(self, f, stats):
+        self._file = f
+        self._stats = stats
+
+    def read(self, *args):
+        start = timer()
+        data = self._file.read(*args)
+        self._record(start, data)
+        return data
+
+    def readinto(self, buf):
+        start = timer()
+        n = self._file.readinto(buf)
+        self._stats.read_seconds += timer() - start
+        self._stats.bytes += n or 0
+        return n
+
+    def readline(self, *args):
+        start = timer()
+        line = self._file.readline(*args)
+        self._record(start, line)
+        return line
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = timer()
+        try:
+            line = next(self._file)
+        except StopIteration:
+            self._record(start, '')
+            raise
+        self._record(start, line)
+        return line
+
+    next = __next__
+
+    def _record(self, start, data):
+        self._stats.read_seconds += timer() - start
+        self._stats.bytes += len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        self._file.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._file.__exit__(*exc_info)
+
+
+def _microseconds(seconds):
+    return '-' if seconds is None else '%.2f' % (seconds * 1e6)
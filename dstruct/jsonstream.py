@@ -0,0 +1,267 @@
+"""Incremental parsing of the repeating elements of large JSON documents"""
+
+import re
+import json
+import codecs
+import itertools
+
+import six
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def iter_items(f, prefix=(), chunk_size=65536, backend=None):
+    """Lazily decode the elements of the array (or object) at a path in a JSON document
+
+    Parameters
+    ----------
+    f: file
+        An open JSON file - preferably opened for reading bytes.
+    prefix: tuple
+        The keys (or array indices) leading to a repeating element of the document.
+    chunk_size: int
+        The number of characters read from the file at a time.
+    backend: "python", "ijson" or None
+        Which parser to use. By default ijson is used when it's installed, and the
+        prefix can be expressed in its syntax (no array indices, or dots in keys).
+
+    Only one element is held in memory at a time. Elements of an object are its
+    values - their keys are discarded. Nothing is yielded if the prefix is absent.
+    """
+    if backend is None:
+        backend = 'ijson' if _ijson_prefix(prefix) is not None else 'python'
+    if backend == 'ijson':
+        return _ijson_items(f, prefix)
+    elif backend == 'python':
+        return _Scanner(f, chunk_size).items(prefix)
+    else:
+        raise ValueError("Unknown JSON parser backend %r" % backend)
+
+
+def _ijson_prefix(prefix):
+    if ijson is None:
+        return None
+    for k in prefix:
+        # "item" is how ijson refers to the elements of an array
+        if not isinstance(k, six.string_types) or '.' in k or k == 'item':
+            return None
+    return '.'.join(prefix)
+
+
+def _ijson_items(f, prefix):
+    p = _ijson_prefix(prefix)
+    if p is None:
+        raise ValueError("The prefix %r cannot be parsed by ijson" % (prefix,))
+    try:
+        events = ijson.parse(f, use_float=True)
+    except TypeError:
+        # older versions of ijson
+        events = ijson.parse(f)
+    for path, event, value in events:
+        if path == p and event not in ('map_key', 'end_array', 'end_map'):
+            break
+    else:
+        return
+    if event not in ('start_array', 'start_map'):
+        raise ValueError("Expected an array or object at %r of the JSON document" % (prefix,))
+    events = itertools.chain([(path, event, value)], events)
+    if event == 'start_array':
+        for item in ijson.items(events, (p + '.item') if p else 'item'):
+            yield item
+    else:
+        for key, item in ijson.kvitems(events, p):
+            yield item
+
+
+_NONSPACE = re.compile(r'\S')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+
+class _Scanner(object):
+    """Finds the bounds of JSON values in a file without decoding them
+
+    Text is read in chunks, and only kept until it has been scanned - or until
+    the value it belongs to has been decoded.
+    """
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = u''
+        self.pos = 0
+        # the number of characters dropped from the buffer
+        self.offset = 0
+        self.mark = None
+        # characters may be split between chunks of bytes
+        self.decode = codecs.getincrementaldecoder('utf-8')().decode
+
+    def _fill(self):
+        keep = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[keep:]
+        self.offset += keep
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark -= keep
+        while True:
+            chunk = self.f.read(self.chunk_size)
+            if not isinstance(chunk, bytes):
+                break
+            text = self.decode(chunk, not chunk)
+            # a chunk may end before a whole character
+            if text or not chunk:
+                chunk = text
+                break
+        self.buf += chunk
+        return bool(chunk)
+
+    def _fail(self, expected):
+        m = "Expected %s at character %i of the JSON document"
+        raise ValueError(m % (expected, self.offset + self.pos))
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end)"""
+        while True:
+            m = _NONSPACE.search(self.buf, self.pos)
+            if m is not None:
+                self.pos = m.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if c == '' or c not in chars:
+            self._fail(' or '.join(repr(c) for c in chars))
+        self.pos += 1
+        return c
+
+    def skip_value(self):
+        c = self.peek()
+        if c == '"':
+            self._skip_string()
+        elif c in ('[', '{'):
+            self._skip_container()
+        elif c in ('', ',', ']', '}', ':'):
+            self._fail('a value')
+        else:
+            self._skip_scalar()
+
+    def read_value(self):
+        self.peek()
+        self.mark = self.pos
+        self.skip_value()
+        text = self.buf[self.mark:self.pos]
+        self.mark = None
+        return json.loads(text)
+
+    def _skip_string(self):
+        self.pos += 1
+        while True:
+            m = _STRING_SPECIAL.search(self.buf, self.pos)
+            if m is None or m.end() == len(self.buf) and m.group() == '\\':
+                # the string (or an escape) continues in the next chunk
+                self.pos = len(self.buf) if m is None else m.start()
+                if not self._fill():
+                    self._fail('the end of a string')
+            elif m.group() == '"':
+                self.pos = m.end()
+                return
+            else:
+                self.pos = m.end() + 1
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            m = _STRUCTURAL.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    self._fail('the end of an array or object')
+                continue
+            c = m.group()
+            if c == '"':
+                self.pos = m.start()
+                self._skip_string()
+                continue
+            self.pos = m.end()
+            if c in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_scalar(self):
+        while True:
+            m = _SCALAR_END.search(self.buf, self.pos)
+            if m is not None:
+                self.pos = m.start()
+                return
+            self.pos = len(self.buf)
+            if not self._fill():
+                return
+
+    def _members(self):
+        # iterate over the keys of an object, leaving the
+        # position at the start of each key's value
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            self.mark = self.pos
+            self.skip_value()
+            key = json.loads(self.buf[self.mark:self.pos])
+            self.mark = None
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def _elements(self):
+        # iterate over the indices of an array, leaving the
+        # position at the start of each element
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        for i in itertools.count():
+            yield i
+            if self.expect(',]') == ']':
+                return
+
+    def _descend(self, key):
+        # move to the value at a key (or index) of the current
+        # value, returning whether it was found
+        c = self.peek()
+        if c == '{':
+            children = self._members()
+        elif c == '[' and isinstance(key, six.integer_types):
+            children = self._elements()
+        else:
+            return False
+        for k in children:
+            if k == key:
+                return True
+            self.skip_value()
+        return False
+
+    def items(self, prefix):
+        for key in prefix:
+            if not self._descend(key):
+                return
+        c = self.peek()
+        if c == '[':
+            children = self._elements()
+        elif c == '{':
+            children = self._members()
+        else:
+            self._fail("an array or object at %r" % (prefix,))
+        for k in children:
+            yield self.read_value()
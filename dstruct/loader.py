@@ -1,24 +1,97 @@
 """A series of classes for loading external data"""
 
+import io
 import csv
 import json
-from .utils import find_file
+import array
+import itertools
+import contextlib
+from collections import deque
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    # Python 2
+    from collections import Mapping
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+except ImportError:
+    # Python 2 without the "futures" backport
+    ThreadPoolExecutor = None
+
+from .utils import find_file, find_files, open_file, map_file, aligned_range, iter_lines, missing
+from .convert import convert_table
+from .instrument import TimedFile
+from .jsonstream import iter_items
 
 class Loader(object):
     """Base loader class for :class:`LoadedDataStruct`"""
     def __init__(*args, **kwargs): pass
     def load(self): pass
 
+    def iter_records(self):
+        """Iterate over the raw records this loader provides
+
+        By default there is only one record - the data returned by ``load``.
+        """
+        yield self.load()
+
 
 class FileLoader(Loader):
 
     filepath = None
+    mmap = False
+    byte_range = None
+    # whether the loader reads a byte_range of its file
+    shardable = False
+    # a dstruct.instrument.LoaderStats recording the time spent loading
+    stats = None
+    # a dstruct.cache.ParseCache keeping what's loaded
+    cache = None
 
     def __init__(self, filename, path=None):
         self.filepath = find_file(filename, path)
 
     def load(self):
-        return self._read_file_as_dict(self.filepath)
+        """Read and decode this loader's file
+
+        If the loader (or its class) has a :class:`dstruct.instrument.LoaderStats`
+        as its ``stats`` attribute, the time spent reading and decoding is added
+        to it. If it has a :class:`dstruct.cache.ParseCache` as its ``cache``
+        attribute, what was loaded before is reused until the file changes.
+        """
+        if self.cache is not None:
+            return self.cache.load(self)
+        return self._load_file()
+
+    def _load_file(self):
+        if self.stats is None:
+            return self._read_file_as_dict(self.filepath)
+        return self.stats.measure_load(self._read_file_as_dict, self.filepath)
+
+    def open_file(self, filepath, *args, **kwargs):
+        """Open a file for reading - see :func:`dstruct.utils.open_file`
+
+        Reads from the file are timed if this loader has ``stats``.
+        """
+        f = open_file(filepath, *args, **kwargs)
+        if self.stats is not None:
+            f = TimedFile(f, self.stats)
+        return f
+
+    def map_file(self):
+        """Memory map this loader's file - see :func:`dstruct.utils.map_file`"""
+        return map_file(self.filepath)
+
+    def mapped_lines(self, buf):
+        """Iterate over the offsets and bytes of the lines in this loader's byte range"""
+        start, end = aligned_range(buf, *(self.byte_range or (0, None)))
+        return iter_lines(buf, start, end)
+
+    def _mapped(self):
+        # byte ranges are read from a memory map
+        return self.mmap or self.byte_range is not None
 
     def _read_file_as_dict(self, filepath):
         pass
@@ -27,78 +100,359 @@ class FileLoader(Loader):
 class JSONLoader(FileLoader):
 
     def _read_file_as_dict(self, filepath):
-        with open(filepath) as f:
+        with self.open_file(filepath) as f:
             d = json.load(f)
         return d
 
+
+class JSONLinesLoader(FileLoader):
+
+    shardable = True
+
+    def __init__(self, filename, path=None, skip_errors=False,
+                 buffer_size=io.DEFAULT_BUFFER_SIZE, mmap=False, byte_range=None):
+        """Load files with one JSON document per line (optionally gzip or bz2 compressed)
+
+        Parameters
+        ----------
+        filename: str
+            The name of the file, found via :func:`dstruct.utils.find_file`.
+        path: str, None or sequence of str
+            The directories to search for the file in.
+        skip_errors: bool (default: False)
+            Whether malformed lines are skipped instead of raising a ``ValueError``.
+            Skipped lines are counted by the loader's ``errors`` attribute.
+        buffer_size: int
+            The number of bytes read from the file at a time.
+        mmap: bool (default: False)
+            Whether the (uncompressed) file is memory mapped, and its lines
+            found in the mapped buffer instead of being read through a file.
+        byte_range: tuple or None
+            The ``(start, end)`` offsets of the part of the file to load. Only
+            lines which begin in the range are loaded (this implies ``mmap``).
+        """
+        super(JSONLinesLoader, self).__init__(filename, path)
+        self.skip_errors = skip_errors
+        self.buffer_size = buffer_size
+        self.mmap = mmap
+        self.byte_range = byte_range
+        self.errors = 0
+
+    def iter_records(self):
+        """Lazily decode each line of the file - blank lines are ignored"""
+        decode = json.JSONDecoder().decode
+        for i, line in self._lines():
+            if line.isspace() or not line:
+                continue
+            try:
+                record = decode(line)
+            except ValueError as e:
+                if not self.skip_errors:
+                    if self._mapped():
+                        m = "Malformed JSON at byte %i of %r: %s"
+                    else:
+                        m = "Malformed JSON on line %i of %r: %s"
+                    raise ValueError(m % (i, self.filepath, e))
+                self.errors += 1
+            else:
+                yield record
+
+    def _lines(self):
+        # the byte offsets of mapped lines, otherwise line numbers
+        if self._mapped():
+            with self.map_file() as buf:
+                for offset, line in self.mapped_lines(buf):
+                    yield offset, line.decode('utf-8')
+        else:
+            with self.open_file(self.filepath, self.buffer_size) as f:
+                for i, line in enumerate(f, 1):
+                    yield i, line
+
+    def _read_file_as_dict(self, filepath):
+        return list(self.iter_records())
+
+class JSONArrayLoader(FileLoader):
+
+    def __init__(self, filename, path=None, prefix=(), chunk_size=65536, backend=None):
+        """Incrementally load the elements of an array (or object) in a JSON file
+
+        Parameters
+        ----------
+        filename: str
+            The name of the file, found via :func:`dstruct.utils.find_file`.
+        path: str, None or sequence of str
+            The directories to search for the file in.
+        prefix: tuple
+            The keys (or array indices) leading to the repeating element. By
+            default the document itself is expected to be an array.
+        chunk_size: int
+            The number of characters read from the file at a time.
+        backend: "python", "ijson" or None
+            The parser used - see :func:`dstruct.jsonstream.iter_items`.
+        """
+        super(JSONArrayLoader, self).__init__(filename, path)
+        self.prefix = tuple(prefix)
+        self.chunk_size = chunk_size
+        self.backend = backend
+
+    def iter_records(self):
+        """Lazily decode each element, holding only one in memory at a time"""
+        with self.open_file(self.filepath, binary=True) as f:
+            for item in iter_items(f, self.prefix, self.chunk_size, self.backend):
+                yield item
+
+    def _read_file_as_dict(self, filepath):
+        return list(self.iter_records())
+
+
 class CSVLoader(FileLoader):
 
-    def __init__(self, filename, path=None, dialect='excel', table_form=None, **fmtparams):
+    shardable = True
+
+    def __init__(self, filename, path=None, dialect='excel', table_form=None,
+                 sample_size=1000, mmap=False, byte_range=None, compact=False,
+                 dtypes=None, empty=None, **fmtparams):
+        """Load a table from a CSV file - see :class:`TableMapping`
+
+        If no ``table_form`` is given, it's infered from the first rows of
+        the table, of which there are at most ``sample_size``. The file is
+        memory mapped if ``mmap`` is true, or a ``byte_range`` is given (see
+        :class:`JSONLinesLoader`). The rows of a byte range are those of a wide
+        form table which begin in it - its header is always the file's first
+        line, and its rows must not contain line breaks. Tables are loaded as
+        a :class:`CompactTableMapping` instead of a :class:`TableMapping` if
+        ``compact`` is true.
+
+        The cells of the table are strings unless ``dtypes`` are given - a
+        dict of column names (or for narrow form tables, the variables in
+        their second to last column) to types like ``int`` or ``float``, or
+        "infer" to find the numeric columns from the sampled rows. Each
+        column is then converted in bulk, and its empty cells become ``empty``
+        (or are left out if it's ``dstruct.utils.missing``). Structs loading
+        typed tables need no parsers for the converted fields.
+        """
         super(CSVLoader, self).__init__(filename, path)
         self.table_form = table_form
+        self.sample_size = sample_size
         self.params = fmtparams
         self.dialect = dialect
+        self.mmap = mmap
+        self.byte_range = byte_range
+        self.compact = compact
+        self.dtypes = dtypes
+        self.empty = empty
+        if byte_range is not None and table_form == 'narrow':
+            raise ValueError("Narrow form tables cannot be split into byte ranges")
 
     def _read_file_as_dict(self, filepath):
-        with open(filepath) as f:
-            reader = csv.reader(f, self.dialect, **self.params)
-            d = TableMapping(list(reader), self.table_form)
+        with self._open_rows() as reader:
+            rows, form = self._table_form(reader)
+            d = self._table_class()(self._convert(rows, form), form)
         return d
 
+    def iter_records(self):
+        """Lazily yield a dict of column names to values for each row of a wide form table
+
+        A narrow form table cannot be split into rows, so it's loaded in
+        whole and yielded as the only record instead.
+        """
+        with self._open_rows() as reader:
+            rows, form = self._table_form(reader)
+            rows = self._convert(rows, form)
+            if form == 'narrow':
+                yield self._table_class()(rows, form)
+            else:
+                header = next(rows, None)
+                if header is None:
+                    pass
+                elif self.dtypes and self.empty is missing:
+                    for row in rows:
+                        yield dict((k, v) for k, v in zip(header, row) if v is not missing)
+                else:
+                    for row in rows:
+                        yield dict(zip(header, row))
+
+    @contextlib.contextmanager
+    def _open_rows(self):
+        # a csv reader of the file's rows, starting with its header
+        if not self._mapped():
+            with self.open_file(self.filepath, newline='') as f:
+                yield csv.reader(f, self.dialect, **self.params)
+            return
+        with self.map_file() as buf:
+            lines = (l.decode('utf-8') for o, l in self.mapped_lines(buf))
+            if self.byte_range is not None and self.byte_range[0] > 0:
+                first = next(iter_lines(buf), (0, b''))[1].decode('utf-8')
+                lines = itertools.chain([first], lines)
+            yield csv.reader(lines, self.dialect, **self.params)
+
+    def _table_class(self):
+        return CompactTableMapping if self.compact else TableMapping
+
+    def _convert(self, rows, form):
+        return convert_table(rows, form, self.dtypes, self.empty, self.sample_size)
+
+    def _table_form(self, rows):
+        if self.table_form is not None:
+            return rows, self.table_form
+        if self.byte_range is not None:
+            return rows, 'wide'
+        sample = list(itertools.islice(rows, self.sample_size))
+        form = TableMapping.infer_encoding(sample)
+        return itertools.chain(sample, rows), form
+
+
+class MultiFileLoader(Loader):
+
+    def __init__(self, patterns, path=None, loader=JSONLoader, recursive=False,
+                 workers=4, max_in_flight=None, ordered=True, **kwargs):
+        """Load the records of many files, reading them concurrently in threads
+
+        Parameters
+        ----------
+        patterns: str or sequence of str
+            Glob patterns, directories or filenames found via
+            :func:`dstruct.utils.find_files`.
+        path: str, None or sequence of str
+            The directories to search for the files in.
+        loader: FileLoader subclass
+            The loader which reads each file. Other keyword arguments are
+            passed to it along with each file's path.
+        recursive: bool (default: False)
+            Whether the files in subdirectories of directories are loaded.
+        workers: int
+            The number of threads reading files.
+        max_in_flight: int or None
+            The most files whose records are held in memory before they're
+            iterated over (the default is twice the number of workers).
+        ordered: bool (default: True)
+            Whether the records of files are yielded in the order of the files,
+            rather than the order they finish being read in.
+        """
+        self.filepaths = find_files(patterns, path, recursive)
+        self.loader = loader
+        self.workers = workers
+        self.max_in_flight = max_in_flight or 2 * workers
+        self.ordered = ordered
+        self.params = kwargs
+
+    def load(self):
+        return list(self.iter_records())
+
+    def iter_records(self):
+        """Lazily yield the records of each file - see :meth:`Loader.iter_records`"""
+        if ThreadPoolExecutor is None:
+            raise ImportError("Reading files concurrently requires concurrent.futures")
+        files = iter(self.filepaths)
+        pending = deque() if self.ordered else set()
+        executor = ThreadPoolExecutor(self.workers)
+        try:
+            while True:
+                for filepath in itertools.islice(files, self.max_in_flight - len(pending)):
+                    f = executor.submit(self._read_records, filepath)
+                    if self.ordered:
+                        pending.append(f)
+                    else:
+                        pending.add(f)
+                if not pending:
+                    break
+                if self.ordered:
+                    done = [pending.popleft()]
+                else:
+                    done = wait(pending, return_when=FIRST_COMPLETED)[0]
+                    pending -= done
+                for f in done:
+                    for record in f.result():
+                        yield record
+        finally:
+            for f in pending:
+                f.cancel()
+            executor.shutdown()
+
+    def _read_records(self, filepath):
+        return list(self.loader(filepath, **self.params).iter_records())
+
 # - - - - - - - - - - - - - - -
 # Data Table Map For CSVLoader
 # - - - - - - - - - - - - - - -
 
 class TableMapping(dict):
 
-    def __init__(self, graph=None, encoding=None):
+    def __init__(self, graph=None, encoding=None, dtypes=None, empty=None):
         """Convert a two dimensional categorical graph into a dict
 
         Parameters
         ----------
         graph: iterable of iterables
-            The two dimensional object in a narrow or wide form encoding
+            The two dimensional object in a narrow or wide form encoding. Its
+            rows are consumed one at a time.
         encoding: "wide" or "narrow" (default: None)
             Specify how the data graph is encoded. If not specified, the
-            encoding is infered based on how categories are organized."""
+            encoding is infered based on how categories are organized.
+        dtypes: dict or "infer" (default: None)
+            The types string cells are converted to by column (or narrow form
+            variable) - see :func:`dstruct.convert.convert_table`.
+        empty: any (default: None)
+            The value of empty cells in converted columns. Cells are left out
+            of the table if it's ``dstruct.utils.missing``."""
         super(TableMapping, self).__init__()
         if graph is not None:
+            if dtypes:
+                if encoding is None:
+                    graph = list(graph)
+                    encoding = self.infer_encoding(graph)
+                graph = convert_table(graph, encoding, dtypes, empty)
             if encoding == 'wide':
                 self._wideform_encoding(graph)
             elif encoding == 'narrow':
                 self._narrowform_encoding(graph)
             else:
                 self.encode_as_dict(graph)
-            
+
     def encode_as_dict(self, graph):
-        for l in list(zip(*graph))[:-1]:
-            # The first two columns are expected to
-            # have shared categories. Thus duplicates
-            # should be present.
-            if len(l) != len(set(l)):
-                return self._narrowform_encoding(graph)
+        graph = list(graph)
+        if self.infer_encoding(graph) == 'narrow':
+            return self._narrowform_encoding(graph)
         else:
             return self._wideform_encoding(graph)
 
+    @staticmethod
+    def infer_encoding(rows):
+        """Infer whether a list of rows are in a "wide" or "narrow" form encoding"""
+        # Each row of a wide form table has its own
+        # category in the first column, whereas rows
+        # of a narrow form table share categories.
+        # Other columns of either may have duplicates.
+        keys = [l[0] for l in rows if l]
+        if len(keys) != len(set(keys)):
+            return 'narrow'
+        else:
+            return 'wide'
+
     def _wideform_encoding(self, ll):
-        for i in range(1, len(ll)):
+        ll = iter(ll)
+        header = next(ll, None)
+        for i, l in enumerate(ll, 1):
             d = {}
-            l = ll[i]
             try:
                 self[l[0]] = d
             except IndexError:
-                raise ValueError("No values in row 0")
+                raise ValueError("No values in row %r" % i)
             for j in range(1, len(l)):
+                if l[j] is missing:
+                    continue
                 try:
-                    v = l[j]
-                except:
+                    d[header[j]] = l[j]
+                except IndexError:
                     m = "No values in row %r, column %r"
                     raise ValueError(m % (i, j))
-                else:
-                    d[ll[0][j]] = v
 
     def _narrowform_encoding(self, ll):
-        for l in ll[1:]:
+        ll = iter(ll)
+        next(ll, None)
+        for l in ll:
+            if l[-1] is missing:
+                continue
             d = self
             for v in l[:-2]:
                 if v in d:
@@ -109,3 +463,217 @@ class TableMapping(dict):
                     d = _d
             k, v = l[-2:]
             d[k] = v
+
+
+class CompactTableMapping(Mapping):
+
+    def __init__(self, graph=None, encoding=None, dtypes=None, empty=None):
+        """A read-only :class:`TableMapping` whose cells are stored in arrays
+
+        Rows and columns are indexed by their categories, and each column is
+        a contiguous array of codes for the distinct values in the table, so
+        large tables with repeated values take a fraction of the memory of
+        nested dicts. Rows are mappings of column categories to values, like
+        the rows of a :class:`TableMapping`. Narrow form tables must have
+        exactly three columns - a row category, column category, and value.
+
+        Parameters
+        ----------
+        graph: iterable of iterables
+            The two dimensional object in a narrow or wide form encoding. Its
+            rows are consumed one at a time.
+        encoding: "wide" or "narrow" (default: None)
+            Specify how the data graph is encoded. If not specified, the
+            encoding is infered based on how categories are organized.
+        dtypes: dict or "infer" (default: None)
+            The types string cells are converted to (see :class:`TableMapping`).
+        empty: any (default: None)
+            The value of empty cells in converted columns.
+        """
+        # the index of each row and column category, in order
+        self._rows = {}
+        self._row_keys = []
+        self._columns = {}
+        self._column_keys = []
+        # an array per column of codes for values (or -1 where there's none)
+        self._codes = []
+        self._values = []
+        # codes by value - or by (type, value) for other than strings,
+        # since equal values of different types (like 1 and 1.0) are distinct
+        self._value_codes = {}
+        if graph is not None:
+            if encoding is None:
+                graph = list(graph)
+                encoding = TableMapping.infer_encoding(graph)
+            if dtypes:
+                graph = convert_table(graph, encoding, dtypes, empty)
+            if encoding == 'wide':
+                self._wideform_encoding(graph)
+            elif encoding == 'narrow':
+                self._narrowform_encoding(graph)
+            else:
+                raise ValueError("Unknown table encoding %r" % encoding)
+
+    def __getitem__(self, row):
+        return _CompactRow(self, self._rows[row])
+
+    def __contains__(self, row):
+        return row in self._rows
+
+    def __iter__(self):
+        return iter(self._row_keys)
+
+    def __len__(self):
+        return len(self._row_keys)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict((k, dict(v)) for k, v in self.items()))
+
+    def columns(self):
+        """The column categories of this table, in the order they were found"""
+        return list(self._column_keys)
+
+    def cell(self, row, column, default=None):
+        """Return the value of a cell, or a default if it's empty"""
+        try:
+            code = self._codes[self._columns[column]][self._rows[row]]
+        except KeyError:
+            return default
+        return default if code < 0 else self._values[code]
+
+    def column_codes(self, column):
+        """Return the array of codes for the values of a column in row order
+
+        Codes index :attr:`values_by_code` - a code of -1 marks an empty cell.
+        """
+        return self._codes[self._columns[column]]
+
+    @property
+    def values_by_code(self):
+        """The distinct values of this table, indexed by their codes"""
+        return self._values
+
+    def column(self, column, default=None):
+        """Return a list of the values of a column in row order (using a default for empty cells)"""
+        values = self._values + [default]
+        return [values[c] for c in self._codes[self._columns[column]]]
+
+    def to_dict(self):
+        """Convert this table into an equivalent :class:`TableMapping`"""
+        table = TableMapping()
+        for k, v in self.items():
+            table[k] = dict(v)
+        return table
+
+    def _code(self, value):
+        key = value if type(value) is str else (type(value), value)
+        try:
+            return self._value_codes[key]
+        except KeyError:
+            code = self._value_codes[key] = len(self._values)
+            self._values.append(value)
+            return code
+
+    def _row(self, key):
+        # the index of a row, which is added if it's new
+        try:
+            return self._rows[key]
+        except KeyError:
+            i = self._rows[key] = len(self._row_keys)
+            self._row_keys.append(key)
+            for codes in self._codes:
+                codes.append(-1)
+            return i
+
+    def _column(self, key):
+        # the index of a column, which is added if it's new
+        try:
+            return self._columns[key]
+        except KeyError:
+            j = self._columns[key] = len(self._column_keys)
+            self._column_keys.append(key)
+            self._codes.append(array.array('i', [-1]) * len(self._row_keys))
+            return j
+
+    def _wideform_encoding(self, ll):
+        ll = iter(ll)
+        header = next(ll, None) or []
+        columns = [self._codes[self._column(k)] for k in header[1:]]
+        empty = [-1] * len(columns)
+        rows, keys = self._rows, self._row_keys
+        value_codes, values = self._value_codes, self._values
+        for i, l in enumerate(ll, 1):
+            if not l:
+                raise ValueError("No values in row %r" % i)
+            if len(l) > len(header):
+                m = "No values in row %r, column %r"
+                raise ValueError(m % (i, len(header)))
+            row = empty[:]
+            for j, v in enumerate(l[1:]):
+                k = v if type(v) is str else (type(v), v)
+                try:
+                    row[j] = value_codes[k]
+                except KeyError:
+                    if v is missing:
+                        continue
+                    row[j] = value_codes[k] = len(values)
+                    values.append(v)
+            r = rows.get(l[0])
+            if r is None and len(self._column_keys) == len(columns):
+                rows[l[0]] = len(keys)
+                keys.append(l[0])
+                for codes, c in zip(columns, row):
+                    codes.append(c)
+            else:
+                # rows with the same category replace each other
+                if r is None:
+                    r = self._row(l[0])
+                for codes, c in zip(columns, row):
+                    codes[r] = c
+
+    def _narrowform_encoding(self, ll):
+        ll = iter(ll)
+        next(ll, None)
+        for l in ll:
+            if len(l) != 3:
+                m = "Compact narrow form tables have three columns, not %i"
+                raise ValueError(m % len(l))
+            row, column, value = l
+            if value is not missing:
+                r = self._row(row)
+                self._codes[self._column(column)][r] = self._code(value)
+
+
+class _CompactRow(Mapping):
+    """A row of a :class:`CompactTableMapping`"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, column):
+        t = self._table
+        code = t._codes[t._columns[column]][self._index]
+        if code < 0:
+            raise KeyError(column)
+        return t._values[code]
+
+    def __contains__(self, column):
+        t = self._table
+        j = t._columns.get(column)
+        return j is not None and t._codes[j][self._index] >= 0
+
+    def __iter__(self):
+        t = self._table
+        i = self._index
+        for k, codes in zip(t._column_keys, t._codes):
+            if codes[i] >= 0:
+                yield k
+
+    def __len__(self):
+        return sum(1 for k in self)
+
+    def __repr__(self):
+        return repr(dict(self))
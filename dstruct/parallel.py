@@ -0,0 +1,241 @@
+"""Mapping of raw records onto data structures with a pool of processes"""
+
+import os
+import time
+import itertools
+import multiprocessing
+from collections import deque
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+except ImportError:
+    # Python 2 without the "futures" backport
+    ProcessPoolExecutor = None
+
+from .utils import missing, find_file
+
+
+def map_parallel(cls, records, workers=None, chunk_size=1000, ordered=True,
+                 stats=None, args=(), kwargs=None, executor=None):
+    """Lazily map raw records onto instances of a struct in worker processes
+
+    Parameters
+    ----------
+    cls: DataStruct subclass
+        The struct records are mapped onto. It must be importable by the
+        workers (i.e. defined at the top level of a module).
+    records: iterable
+        The raw data for each instance. Records are sent to the workers in
+        chunks, and only a few chunks per worker are in flight at a time.
+    workers: int or None
+        The number of worker processes (the default is the number of CPUs).
+    chunk_size: int
+        The number of records sent to a worker at a time.
+    ordered: bool (default: True)
+        Whether instances are yielded in the order of their records, rather
+        than the order their chunks finish in.
+    stats: dict or None
+        If given, this is filled with the number of ``records``, ``chunks``
+        and ``seconds`` spent mapping them for each worker's process id, along
+        with their throughput in ``records_per_second``.
+    args, kwargs:
+        Passed to :meth:`DataStruct.map_many` in the workers, and used to
+        create the instances returned to the caller.
+    executor: concurrent.futures.Executor or None
+        An executor to submit chunks to instead of a new process pool.
+
+    Workers send back the values of each instance's fields as tuples instead
+    of pickling the instances themselves. Method type parsers are bound to an
+    instance created in the worker, exactly as they would be by ``map_many``.
+
+    This requires :mod:`concurrent.futures` - on Python 2 install the ``futures``
+    backport.
+    """
+    if ProcessPoolExecutor is None:
+        raise ImportError("Mapping records in parallel requires concurrent.futures")
+    kwargs = kwargs or {}
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(workers)
+    limit = 2 * (workers or multiprocessing.cpu_count())
+    tasks = ((_map_chunk, cls, chunk, args, kwargs) for chunk in _chunks(records, chunk_size))
+    new = cls._instance_factory(*args, **kwargs)
+    try:
+        for names, rows, pid, seconds in _run_tasks(executor, tasks, limit, ordered):
+            if stats is not None:
+                _record_stats(stats, pid, len(rows), seconds)
+            for inst in _rebuild(cls, new, names, rows):
+                yield inst
+    finally:
+        if own:
+            executor.shutdown()
+
+
+def map_shards(cls, filename, path=None, shards=None, workers=None, ordered=True,
+               columns=False, stats=None, loader=None, loader_kwargs=None,
+               args=(), kwargs=None, executor=None):
+    """Map the records of one large file onto a struct in worker processes
+
+    Parameters
+    ----------
+    cls: DataStruct subclass
+        The struct records are mapped onto. It must be importable by the
+        workers (i.e. defined at the top level of a module).
+    filename: str
+        The file to read. It's found with :func:`dstruct.utils.find_file`.
+    path: str, sequence of str, or None
+        Directories the file is looked for in.
+    shards: int or None
+        The number of byte ranges the file is split into (the default is four
+        per worker). Each shard is aligned to the records it holds by its loader.
+    workers: int or None
+        The number of worker processes (the default is the number of CPUs).
+    ordered: bool (default: True)
+        Whether results are returned in the order of the file, rather than the
+        order their shards finish in.
+    columns: bool (default: False)
+        If true, return a dict of field names to lists of their values (see
+        :meth:`DataStruct.map_columns`) instead of lazily yielding instances.
+    stats: dict or None
+        If given, this is filled with the ``byte_range`` of each shard's index,
+        the number of ``records`` it held, the ``seconds`` spent mapping them
+        and the process id of the worker that did so.
+    loader: Loader subclass or None
+        A loader which reads a ``byte_range`` of a file, like
+        :class:`JSONLinesLoader` or :class:`CSVLoader`. It defaults to the
+        ``_loader`` of the struct.
+    loader_kwargs: dict or None
+        Other arguments the loader of each shard is created with.
+    args, kwargs:
+        Passed to :meth:`DataStruct.map_many` in the workers, and used to
+        create the instances returned to the caller.
+    executor: concurrent.futures.Executor or None
+        An executor to submit shards to instead of a new process pool.
+    """
+    if ProcessPoolExecutor is None:
+        raise ImportError("Mapping files in parallel requires concurrent.futures")
+    if loader is None:
+        loader = getattr(cls, '_loader', None)
+    if not getattr(loader, 'shardable', False):
+        raise ValueError("%r can't read byte ranges of a file" % loader)
+    filepath = find_file(filename, path)
+    workers = workers or multiprocessing.cpu_count()
+    ranges = shard_ranges(os.path.getsize(filepath), shards or 4 * workers)
+    loader_kwargs = loader_kwargs or {}
+    kwargs = kwargs or {}
+    tasks = ((_map_shard, cls, loader, filepath, i, r, loader_kwargs, args, kwargs, columns)
+             for i, r in enumerate(ranges))
+    results = _map_shards(executor, workers, tasks, ordered, stats)
+    if columns:
+        merged = dict((n, []) for n in cls._field_paths)
+        for result in results:
+            for n, values in result.items():
+                merged[n].extend(values)
+        return merged
+    return _shard_structs(cls, results, args, kwargs)
+
+
+def shard_ranges(size, shards):
+    """Split a number of bytes into a list of ``(start, end)`` ranges of about equal size"""
+    shards = max(1, min(shards, size))
+    return [(size * i // shards, size * (i + 1) // shards) for i in range(shards)]
+
+
+def _map_shards(executor, workers, tasks, ordered, stats):
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        for index, byte_range, result, count, pid, seconds in \
+                _run_tasks(executor, tasks, 2 * workers, ordered):
+            if stats is not None:
+                stats[index] = {'byte_range': byte_range, 'records': count,
+                                'seconds': seconds, 'pid': pid}
+            yield result
+    finally:
+        if own:
+            executor.shutdown()
+
+
+def _shard_structs(cls, results, args, kwargs):
+    new = cls._instance_factory(*args, **kwargs)
+    for names, rows in results:
+        for inst in _rebuild(cls, new, names, rows):
+            yield inst
+
+
+def _run_tasks(executor, tasks, limit, ordered):
+    # yield the results of (function, *args) tasks with at most limit in flight
+    pending = deque() if ordered else set()
+    while True:
+        for task in itertools.islice(tasks, limit - len(pending)):
+            f = executor.submit(*task)
+            if ordered:
+                pending.append(f)
+            else:
+                pending.add(f)
+        if not pending:
+            break
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            done = wait(pending, return_when=FIRST_COMPLETED)[0]
+            pending -= done
+        for f in done:
+            yield f.result()
+
+
+def _rebuild(cls, new, names, rows):
+    # set the values sent back by a worker on new instances
+    setters = [getattr(cls, n).set for n in names]
+    for row in rows:
+        inst = new()
+        for s, v in zip(setters, row):
+            if v is not missing:
+                s(inst, v)
+        yield inst
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunk(cls, records, args, kwargs):
+    start = time.time()
+    names, rows = _rows(cls, cls.map_many(records, *args, **kwargs))
+    return names, rows, os.getpid(), time.time() - start
+
+
+def _map_shard(cls, loader, filepath, index, byte_range, loader_kwargs, args, kwargs, columns):
+    start = time.time()
+    records = loader(filepath, byte_range=byte_range, **loader_kwargs).iter_records()
+    if columns:
+        result = cls.map_columns(records, *args, **kwargs)
+        count = len(next(iter(result.values()), ()))
+    else:
+        result = _rows(cls, cls.map_many(records, *args, **kwargs))
+        count = len(result[1])
+    return index, byte_range, result, count, os.getpid(), time.time() - start
+
+
+def _rows(cls, instances):
+    # the values of each instance's fields as tuples
+    names = tuple(cls._field_paths)
+    rows = []
+    for inst in instances:
+        values = inst._parsed_field_values()
+        rows.append(tuple(values.get(n, missing) for n in names))
+    return names, rows
+
+
+def _record_stats(stats, pid, records, seconds):
+    s = stats.setdefault(pid, {'records': 0, 'chunks': 0, 'seconds': 0.0})
+    s['records'] += records
+    s['chunks'] += 1
+    s['seconds'] += seconds
+    s['records_per_second'] = s['records'] / s['seconds'] if s['seconds'] else 0.0
@@ -0,0 +1,284 @@
+"""Compilation of field paths into shared lookup plans
+
+The keys of a path are looked up in mappings (any ``Mapping``, not only
+``dict``). Integers also index sequences like lists and tuples, and slices
+fan out over the items of a sequence - the rest of the path is followed from
+each item in the slice, and the values found make up a list. The wildcard
+``slice(None)`` fans out over every item.
+"""
+
+import re
+
+import six
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    # Python 2
+    from collections import Mapping, Sequence
+
+
+def compile_paths(paths):
+    """Compile a mapping of field names to paths into a prefix trie
+
+    Parameters
+    ----------
+    paths: dict
+        A mapping of field names to tuples of keys.
+
+    Returns
+    -------
+    A trie node of the form ``(names, branches, fanouts, indexes)`` where
+    ``names`` is a tuple of the fields whose path ends at the node, and
+    ``branches`` is a tuple of ``(key, node)`` pairs for the paths which
+    continue past it - ``indexes`` are the branches whose key may also index
+    a sequence. Paths which fan out over a slice end at the node before it,
+    with a ``(name, accessor)`` pair in ``fanouts`` where the accessor (see
+    :func:`compile_accessor`) gets their value from the rest of the path.
+    Fields which share a prefix share the nodes along that prefix, so
+    resolving the trie looks up each shared key only once.
+    """
+    root = ([], [], [])
+    for name, path in paths.items():
+        path = tuple(path)
+        node = root
+        for i, key in enumerate(path):
+            if isinstance(key, slice):
+                node[2].append((name, compile_accessor(path[i:])))
+                break
+            for k, child in node[1]:
+                if type(k) is type(key) and k == key:
+                    node = child
+                    break
+            else:
+                child = ([], [], [])
+                node[1].append((key, child))
+                node = child
+        else:
+            node[0].append(name)
+    return _freeze(root)
+
+
+def _freeze(node):
+    names, branches, fanouts = node
+    branches = tuple((k, _freeze(n)) for k, n in branches)
+    indexes = tuple((k, n) for k, n in branches if is_index(k))
+    return (tuple(names), branches, tuple(fanouts), indexes)
+
+
+def resolve_paths(trie, data, out=None):
+    """Collect the ``(name, value)`` pairs a compiled trie finds in ``data``
+
+    A field whose path cannot be followed to its end is absent from the result.
+    """
+    if out is None:
+        out = []
+    names, branches, fanouts, indexes = trie
+    for n in names:
+        out.append((n, data))
+    for n, get in fanouts:
+        try:
+            out.append((n, get(data)))
+        except KeyError:
+            pass
+    if not branches:
+        pass
+    elif isinstance(data, dict) or is_mapping(data):
+        for k, child in branches:
+            if k in data:
+                if child[1] or child[2]:
+                    resolve_paths(child, data[k], out)
+                else:
+                    # leaves are common enough to inline
+                    v = data[k]
+                    for n in child[0]:
+                        out.append((n, v))
+    elif indexes and is_sequence(data):
+        for k, child in indexes:
+            if -len(data) <= k < len(data):
+                resolve_paths(child, data[k], out)
+    return out
+
+
+def compile_accessor(path):
+    """Compile a path into a function which gets the value at it in raw data
+
+    The function raises a ``KeyError`` if the path can't be followed to its
+    end - exactly when :func:`resolve_paths` omits it. Where the path fans out
+    over a slice, items the rest of the path can't be followed from are left
+    out of the list of values.
+    """
+    path = tuple(path)
+    for i, key in enumerate(path):
+        if isinstance(key, slice):
+            fanout = _compile_fanout(key, path[i + 1:])
+            if not i:
+                return fanout
+            head = _compile_keys(path[:i])
+            return lambda data: fanout(head(data))
+    return _compile_keys(path)
+
+
+def _compile_keys(path):
+    if not path:
+        return lambda data: data
+    elif len(path) == 1:
+        key = path[0]
+        def get(data):
+            if isinstance(data, dict):
+                return data[key]
+            return lookup(data, key)
+    else:
+        def get(data):
+            for key in path:
+                if isinstance(data, dict):
+                    data = data[key]
+                else:
+                    data = lookup(data, key)
+            return data
+    return get
+
+
+def _compile_fanout(items, rest):
+    every = items == slice(None)
+    if not rest:
+        def get(data):
+            if not (isinstance(data, list) or is_sequence(data)):
+                raise KeyError(items)
+            return list(data if every else data[items])
+        return get
+    tail = compile_accessor(rest)
+    if any(isinstance(k, slice) for k in rest):
+        def get(data):
+            if not (isinstance(data, list) or is_sequence(data)):
+                raise KeyError(items)
+            return _follow(data if every else data[items], tail)
+        return get
+    return _compile_comprehension(items, rest, tail)
+
+
+def _compile_comprehension(items, path, tail):
+    # follow a path of keys through dicts from each item in a list comprehension,
+    # falling back to the tail's accessor if any item isn't such a nested dict
+    namespace = {'isinstance': isinstance, 'dict': dict, 'list': list, 'len': len,
+                 'is_sequence': is_sequence, 'follow': _follow, 'tail': tail,
+                 'KeyError': KeyError, 's': items}
+    value = 'item'
+    conditions = []
+    for i, key in enumerate(path):
+        namespace['k%i' % i] = key
+        conditions.append('isinstance(%s, dict) and k%i in %s' % (value, i, value))
+        value = '%s[k%i]' % (value, i)
+    source = '\n'.join([
+        'def get(data):',
+        '    if not (isinstance(data, list) or is_sequence(data)):',
+        '        raise KeyError(s)',
+        '    data = data' if items == slice(None) else '    data = data[s]',
+        '    values = [%s for item in data if %s]' % (value, ' and '.join(conditions)),
+        '    if len(values) == len(data):',
+        '        return values',
+        '    return follow(data, tail)'])
+    six.exec_(compile(source, '<path %s>' % format_path((items,) + path), 'exec'), namespace)
+    return namespace['get']
+
+
+def _follow(items, tail):
+    values = []
+    for item in items:
+        try:
+            values.append(tail(item))
+        except KeyError:
+            pass
+    return values
+
+
+def lookup(data, key):
+    """Get the value of a key in a mapping, or at an index of a sequence
+
+    Raises a ``KeyError`` if there's no such key or index.
+    """
+    if is_mapping(data):
+        return data[key]
+    if is_index(key) and is_sequence(data):
+        try:
+            return data[key]
+        except IndexError:
+            pass
+    raise KeyError(key)
+
+
+def is_mapping(data):
+    return isinstance(data, Mapping)
+
+
+def is_sequence(data):
+    """Whether data is a sequence of items paths can index (but not a string)"""
+    if isinstance(data, (list, tuple)):
+        return True
+    return isinstance(data, Sequence) and not isinstance(data, (six.string_types, bytes))
+
+
+def is_index(key):
+    return isinstance(key, six.integer_types) and not isinstance(key, bool)
+
+
+_path_tokens = re.compile(r"""
+    \[\s*(?:
+        (?P<wildcard>\*) |
+        (?P<index>-?\d+) |
+        (?P<slice>-?\d*\s*:\s*-?\d*(?:\s*:\s*-?\d*)?) |
+        '(?P<single>[^']*)' |
+        "(?P<double>[^"]*)"
+    )\s*\] |
+    (?P<dot>\.)? (?P<key>[^.\[\]]+)
+""", re.VERBOSE)
+
+
+def parse_path(string):
+    """Parse a path written like ``"events[*].amount"`` into a tuple of keys
+
+    Keys are separated by dots, while brackets hold integer indexes, slices
+    (``[1:]``), the wildcard ``[*]``, or quoted keys (``['a.b']``).
+    """
+    path = []
+    position = 0
+    while position < len(string):
+        m = _path_tokens.match(string, position)
+        if m is None or (m.group('key') is not None and bool(m.group('dot')) != bool(position)):
+            raise ValueError("Invalid path %r at character %i" % (string, position))
+        if m.group('wildcard'):
+            path.append(slice(None))
+        elif m.group('index') is not None:
+            path.append(int(m.group('index')))
+        elif m.group('slice') is not None:
+            bounds = [b.strip() for b in m.group('slice').split(':')]
+            path.append(slice(*[int(b) if b else None for b in bounds]))
+        elif m.group('single') is not None:
+            path.append(m.group('single'))
+        elif m.group('double') is not None:
+            path.append(m.group('double'))
+        else:
+            path.append(m.group('key'))
+        position = m.end()
+    return tuple(path)
+
+
+def format_path(path):
+    """Write a path in the syntax read by :func:`parse_path`"""
+    parts = []
+    for key in path:
+        if isinstance(key, slice):
+            if key == slice(None):
+                parts.append('[*]')
+            else:
+                bounds = [key.start, key.stop] + ([key.step] if key.step is not None else [])
+                parts.append('[%s]' % ':'.join('' if b is None else str(b) for b in bounds))
+        elif is_index(key):
+            parts.append('[%i]' % key)
+        elif isinstance(key, six.string_types) and re.match(r'^[^.\[\]\'"]+$', key):
+            parts.append(('.' if parts else '') + key)
+        elif isinstance(key, six.string_types):
+            parts.append(('["%s"]' if "'" in key else "['%s']") % key)
+        else:
+            raise ValueError("The key %r can't be written in a path" % (key,))
+    return ''.join(parts)
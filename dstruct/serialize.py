@@ -0,0 +1,107 @@
+"""Serialization of data structures to JSON and JSON Lines"""
+
+import io
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json(obj, indent=None, sort_keys=False, backend=None):
+    """Serialize a struct (or any JSON data containing structs) to a JSON string
+
+    Parameters
+    ----------
+    obj: any
+        The data to serialize. Nested structs are serialized as objects of
+        their fields' values without copying them.
+    indent: int or None
+        The indentation of the output. By default it is compact.
+    sort_keys: bool
+        Whether the keys of objects are sorted.
+    backend: "orjson", "json" or None
+        Which encoder to use. By default orjson is used when it's installed,
+        falling back to the standard library for data it can't encode (like
+        integers beyond 64 bits). Unlike the standard library's encoder orjson
+        serializes NaN and infinite floats as ``null``.
+    """
+    return _encoder(backend, indent, sort_keys)(obj).decode('utf-8')
+
+
+def dump_many(structs, f, sort_keys=False, backend=None, batch_size=1000):
+    """Write a stream of structs to a file as JSON Lines
+
+    Parameters
+    ----------
+    structs: iterable
+        The structs (or other JSON data) written one per line.
+    f: file
+        A file open for writing text or bytes.
+    sort_keys: bool
+        Whether the keys of objects are sorted.
+    backend: "orjson", "json" or None
+        Which encoder to use (see :func:`to_json`).
+    batch_size: int
+        The number of lines written to the file at a time.
+
+    Returns the number of lines written.
+    """
+    encode = _encoder(backend, None, sort_keys)
+    text = isinstance(f, io.TextIOBase)
+    count = 0
+    batch = []
+    for s in structs:
+        batch.append(encode(s))
+        if len(batch) == batch_size:
+            count += _write_lines(f, batch, text)
+            batch = []
+    if batch:
+        count += _write_lines(f, batch, text)
+    return count
+
+
+def _write_lines(f, lines, text):
+    data = b'\n'.join(lines) + b'\n'
+    f.write(data.decode('utf-8') if text else data)
+    return len(lines)
+
+
+def _default(obj):
+    try:
+        values = obj._parsed_field_values
+    except AttributeError:
+        m = "Object of type %r is not JSON serializable"
+        raise TypeError(m % type(obj).__name__)
+    return values()
+
+
+def _encoder(backend, indent, sort_keys):
+    # returns a function encoding objects as UTF-8 bytes
+    if backend is None:
+        backend = 'json' if orjson is None else 'orjson'
+    if backend == 'json':
+        separators = (',', ':') if indent is None else (',', ': ')
+        encoder = json.JSONEncoder(default=_default, indent=indent, sort_keys=sort_keys,
+                                   separators=separators, ensure_ascii=False)
+        return lambda obj: encoder.encode(obj).encode('utf-8')
+    elif backend == 'orjson':
+        if orjson is None:
+            raise ImportError("The orjson backend requires orjson")
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent is not None:
+            if indent != 2:
+                raise ValueError("The orjson backend can only indent by 2 spaces")
+            option |= orjson.OPT_INDENT_2
+        fallback = _encoder('json', indent, sort_keys)
+        def encode(obj):
+            try:
+                return orjson.dumps(obj, default=_default, option=option)
+            except TypeError:
+                return fallback(obj)
+        return encode
+    else:
+        raise ValueError("Unknown JSON encoder backend %r" % backend)
@@ -76,4 +76,9 @@ wide_csv = """Person,Age,Weight
 Bob,32,178
 Alice,24,150
 Steve,64,195
-"""
\ No newline at end of file
+"""
+events_jsonl = """{"id": 1, "payload": {"kind": "click", "amount": "1.5"}}
+{"id": 2, "payload": {"kind": "view"}}
+
+{"id": 3, "payload": {"kind": "click", "amount": "3.0"}}
+"""
@@ -1,10 +1,24 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
+import sys
+import json
 import types
 import os
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+try:
+	import pyarrow
+except ImportError:
+	pyarrow = None
+
 from dstruct import (HasDescriptors, BaseDescriptor, DataStruct, DataField,
-	FieldError, dataparser, datafield, DataStructFromJSON, DataStructFromCSV)
+	FieldError, dataparser, datafield, DataStructFromJSON, DataStructFromCSV,
+	CompactDataStruct, DataStructFromJSONLines, LRUCache, dump_many)
+from dstruct.loader import JSONLoader, JSONLinesLoader, JSONArrayLoader, MultiFileLoader
 
 class TestHasDescriptors(TestCase):
 
@@ -41,6 +55,25 @@ class TestHasDescriptors(TestCase):
 		self.assertEqual(set(b.members),set([B.x, B.y]))
 
 
+class Offset(DataStruct):
+	# defined at the top level for worker processes
+	def __init__(self, data=None, offset=0):
+		self.offset = offset
+		super(Offset, self).__init__(data)
+	x = DataField('m', 'n')
+	y = DataField(parser=str)
+	@dataparser('x')
+	def add_offset(self, data):
+		return data + self.offset
+
+
+class Event(DataStructFromJSONLines):
+	# defined at the top level for worker processes
+	id = DataField()
+	kind = DataField('payload', 'kind')
+	amount = DataField('payload', 'amount', parser=float)
+
+
 class TestDataStruct(TestCase):
 
 	def test_fields(self):
@@ -92,6 +125,39 @@ class TestDataStruct(TestCase):
 		# check that the original class wasn't touched
 		self.assertEqual(class_fields, B.fields())
 
+	def test_set_and_del_class_field(self):
+		class A(DataStruct):
+			x = DataField()
+		class B(A): pass
+
+		# cache what's known about the fields
+		self.assertEqual(B.fields(), {'x': A.x})
+
+		A.y = DataField('m')
+		self.assertEqual(A.y.this_name, 'y')
+		self.assertEqual(B.fields(), {'x': A.x, 'y': A.y})
+		self.assertEqual(B({'x': 1, 'm': 2}), {'x': 1, 'y': 2})
+
+		del A.x
+		self.assertEqual(B.fields(), {'y': A.y})
+		self.assertEqual(B({'x': 1, 'm': 2}), {'y': 2})
+
+	def test_map_parallel(self):
+		records = [{'m': {'n': i}, 'y': i} if i % 3 else {'y': i} for i in range(25)]
+		expected = [Offset(r, offset=10) for r in records]
+
+		stats = {}
+		structs = Offset.map_parallel(records, workers=2, chunk_size=4,
+									  stats=stats, kwargs={'offset': 10})
+		self.assertEqual(list(structs), expected)
+		self.assertEqual(sum(s['records'] for s in stats.values()), 25)
+		self.assertEqual(sum(s['chunks'] for s in stats.values()), 7)
+
+		structs = Offset.map_parallel(records, workers=2, chunk_size=4,
+									  ordered=False, kwargs={'offset': 10})
+		key = lambda s: s.y
+		self.assertEqual(sorted(structs, key=key), sorted(expected, key=key))
+
 
 class TestDataField(TestCase):
 
@@ -126,6 +192,364 @@ class TestDataField(TestCase):
 		a = A({'m': {'n': 0}})
 		self.assertEqual(a.x, 0)
 
+	def test_fields_with_shared_paths(self):
+		class A(DataStruct):
+			x = DataField('m', 'n', 'x')
+			y = DataField('m', 'n', 'y')
+			z = DataField('m', 'z')
+			w = DataField('m', 'n', 'x', 'w')
+			raw = DataField(path=None)
+		data = {'m': {'n': {'x': 1, 'y': 2}, 'z': 3}}
+		a = A(data)
+		self.assertEqual(a, {'x': 1, 'y': 2, 'z': 3, 'raw': data})
+		# paths which can't be followed leave fields unset
+		a = A({'m': {'n': 0}})
+		self.assertEqual(a, {'raw': {'m': {'n': 0}}})
+
+	def test_generated_update(self):
+		class Doubled(DataField):
+			def parse_value(self, inst, value):
+				return value * 2
+		class A(DataStruct):
+			x = DataField('m', 'n', parser=int)
+			y = DataField('m', 'n')
+			z = Doubled('z')
+			raw = DataField(path=None)
+			@datafield('m')
+			def w(self, data):
+				return repr(data)
+		class B(A):
+			generate_update = False
+
+		records = [{'m': {'n': '1'}, 'z': 2}, {'m': 0, 'z': 'a'}, None, 3]
+		self.assertTrue(A.update.generated)
+		for r in records:
+			self.assertEqual(A(r), B(r))
+		a = A(records[0])
+		self.assertEqual((a.x, a.y, a.z, a.w), (1, '1', 4, "{'n': '1'}"))
+
+		# methods are regenerated when fields change
+		A.v = DataField('m')
+		self.assertEqual(A(records[0]).v, {'n': '1'})
+		del A.x
+		self.assertNotIn('x', A(records[0]))
+
+	def test_lazy_parsing(self):
+		calls = []
+		def parse(value):
+			calls.append(value)
+			return int(value)
+		class A(DataStruct):
+			x = DataField(parser=parse, lazy=True)
+			y = DataField(parser=parse)
+		class B(A):
+			lazy_parsing = True
+			generate_update = False
+		class C(B):
+			z = DataField(parser=parse, lazy=False)
+
+		for cls in (A, B, C):
+			del calls[:]
+			s = cls({'x': '1', 'y': '2', 'z': '3'})
+			self.assertEqual(calls, ['3'] if cls is C else ['2'] if cls is A else [])
+			self.assertEqual(s.x, 1)
+			self.assertEqual(s.x, 1)
+			self.assertEqual(calls.count('1'), 1)
+
+		# deferred values are parsed when compared or encoded
+		s = B({'x': '1', 'y': '2'})
+		self.assertEqual(s, {'x': 1, 'y': 2})
+		self.assertEqual(repr(B({'x': '1'})), '{"x": 1}')
+		# values set without parsing replace deferred ones
+		s = B({'x': '1'})
+		s.set_field('x', 'raw')
+		self.assertEqual(s.x, 'raw')
+
+	def test_instrumented_update(self):
+		import pstats
+		class A(DataStruct):
+			x = DataField('m', 'n', parser=int)
+			y = DataField('m', 'n')
+			z = DataField(parser=int, lazy=True)
+			w = DataField('w', slice(None), parser=len)
+		class B(A):
+			instrumented = True
+			generate_update = False
+
+		records = [{'m': {'n': '1'}, 'z': '2', 'w': [[1]]}, {'m': 0}, None]
+		self.assertIsNone(A.field_stats())
+		self.assertEqual([B(r) for r in records], [A(r) for r in records])
+		stats = B.field_stats().to_dict()
+		self.assertEqual(stats['records'], 2)
+		self.assertEqual(dict((k, (f['hits'], f['missing'], f['deferred'], f['parser_calls']))
+							  for k, f in stats['fields'].items()),
+						 {'x': (1, 1, 0, 1), 'y': (1, 1, 0, 0), 'z': (1, 1, 1, 0), 'w': (1, 1, 0, 1)})
+		self.assertGreater(stats['fields']['x']['parser_p99_seconds'], 0)
+		profile = pstats.Stats(B.field_stats())
+		self.assertEqual(profile.total_calls, 4)
+
+		# stats are reset when fields change, and dropped when disabled
+		B.v = DataField('m')
+		self.assertEqual(B.field_stats().records, 0)
+		B.instrumented = False
+		self.assertIsNone(B.field_stats())
+		self.assertNotIn('update', B.__dict__)
+
+	def test_path_language(self):
+		from dstruct.paths import parse_path, format_path
+
+		class Mapping(dict): pass
+		class A(DataStruct):
+			amounts = DataField(*parse_path('events[*].amount'))
+			kinds = DataField('events', slice(None, 2), 'meta', 'kind')
+			first = DataField('rows', 0, 'id')
+			last = DataField('rows', -1, 'id')
+			items = DataField(*parse_path('groups[*].items[*]'))
+		class B(A):
+			generate_update = False
+
+		record = {'events': [{'amount': 1, 'meta': {'kind': 'a'}}, {}, {'amount': 3}],
+				  'rows': ({'id': 7}, Mapping(id=9)),
+				  'groups': [{'items': [1, 2]}, {'items': 'no'}, {'items': (3,)}]}
+		expected = {'amounts': [1, 3], 'kinds': ['a'], 'first': 7, 'last': 9,
+					'items': [[1, 2], [3]]}
+		for cls in (A, B):
+			self.assertEqual(cls(record), expected)
+			self.assertEqual(cls.view(record), expected)
+			self.assertEqual(cls({'events': 'abc', 'rows': []}), {})
+
+		self.assertEqual(parse_path("a[0].b[*]['c.d'][1:-1:2]"),
+						 ('a', 0, 'b', slice(None), 'c.d', slice(1, -1, 2)))
+		self.assertEqual(format_path(('a', 0, 'b', slice(None), 'c.d')), "a[0].b[*]['c.d']")
+		with self.assertRaises(ValueError):
+			parse_path('a..b')
+
+	def test_struct_views(self):
+		calls = []
+		def parse(value):
+			calls.append(value)
+			return int(value)
+		class A(DataStruct):
+			x = DataField('m', 'n', parser=parse)
+			y = DataField('m', 'y')
+			z = DataField('z')
+
+		record = {'m': {'n': '1', 'y': 2}}
+		for cache in (True, False):
+			del calls[:]
+			a = A.view(record, cache=cache)
+			self.assertEqual(calls, [])
+			self.assertEqual((a.x, a['x'], a.y), (1, 1, 2))
+			self.assertEqual(len(calls), 1 if cache else 2)
+			self.assertEqual(a, A(record))
+			self.assertEqual(sorted(a), ['x', 'y'])
+			self.assertEqual(repr(a), repr(A(record)))
+			with self.assertRaises(FieldError):
+				a.z
+
+		# set values override the record
+		a = A.view(record)
+		a.y = 3
+		self.assertEqual(a, {'x': 1, 'y': 3})
+		# materialized structs are detached from the record
+		a = A.view(record).materialize()
+		record['m']['y'] = 4
+		self.assertEqual(type(a._field_values), dict)
+		self.assertEqual(a, {'x': 1, 'y': 2})
+		self.assertEqual(A.view(record).y, 4)
+		self.assertEqual(list(A.map_views([record, {}])), [A(record), {}])
+
+	def test_to_json(self):
+		import io
+		from dstruct.serialize import orjson
+		class A(DataStruct):
+			x = DataField(parser=int, lazy=True)
+			inner = DataField()
+
+		a = A({'x': '1', 'inner': A({'x': '2'})})
+		backends = ('json', 'orjson') if orjson is not None else ('json',)
+		for backend in backends:
+			self.assertEqual(a.to_json(sort_keys=True, backend=backend),
+							 '{"inner":{"x":2},"x":1}')
+			self.assertEqual(json.loads(a.to_json(indent=2, backend=backend)),
+							 json.loads(str(a)))
+			for f in (io.StringIO(), io.BytesIO()):
+				self.assertEqual(dump_many([a, A({'x': 3})], f, backend=backend), 2)
+				lines = f.getvalue().splitlines()
+				self.assertEqual([json.loads(l) for l in lines],
+								 [{'x': 1, 'inner': {'x': 2}}, {'x': 3}])
+		with self.assertRaises(TypeError):
+			A({'inner': object()}).to_json()
+
+	def test_map_many(self):
+		class A(DataStruct):
+			x = DataField('m', 'n')
+			y = DataField(parser=lambda v: v+1)
+		class B(A):
+			def __init__(self, data=None, offset=0):
+				self.offset = offset
+				super(B, self).__init__(data)
+			@dataparser('x')
+			def add_offset(self, data):
+				return data + self.offset
+
+		records = [{'m': {'n': 0}, 'y': 1}, {'y': 2}]
+		structs = list(A.map_many(records))
+		self.assertEqual(structs, [A(r) for r in records])
+		self.assertTrue(all(type(s) is A for s in structs))
+
+		structs = list(B.map_many(records, offset=10))
+		self.assertEqual(structs, [B(r, offset=10) for r in records])
+
+		columns = B.map_columns(records, offset=10)
+		self.assertEqual(columns, {'x': [10, None], 'y': [2, 3]})
+
+
+class TestCompactDataStruct(TestCase):
+
+	def test_slotted_fields(self):
+		class A(CompactDataStruct):
+			x = DataField('m', 'n')
+		class B(A):
+			y = DataField(parser=int)
+
+		b = B({'m': {'n': 1}, 'y': '2'})
+		self.assertFalse(hasattr(b, '__dict__'))
+		self.assertEqual((b.x, b['y']), (1, 2))
+		self.assertEqual(b, {'x': 1, 'y': 2})
+		self.assertEqual(sorted(b), ['x', 'y'])
+		self.assertEqual(repr(b), '{"x": 1, "y": 2}')
+		b.set_field('x', 3)
+		self.assertEqual(b.x, 3)
+		# state is restored without parsing
+		c = B()
+		c.__setstate__(b.__getstate__())
+		self.assertEqual(c, b)
+		with self.assertRaises(FieldError):
+			B().x
+		with self.assertRaises(AttributeError):
+			b.z = 1
+		with self.assertRaises(FieldError):
+			b.add_fields(z=DataField())
+
+	def test_non_compact_fields(self):
+		# regular structs keep their __dict__
+		s = DataStruct()
+		s.y = 1
+		self.assertEqual((s.y, s), (1, {}))
+
+		class A(DataStruct):
+			x = DataField()
+		with self.assertRaises(FieldError):
+			class B(A, CompactDataStruct):
+				pass
+
+
+@skipIf(numpy is None, "requires numpy")
+class TestMapArrays(TestCase):
+
+	def test_typed_arrays(self):
+		class A(DataStruct):
+			x = DataField('m', 'x', dtype='f8')
+			y = DataField('m', 'y', dtype='i4')
+			z = DataField(dtype='U')
+		records = [{'m': {'x': 1, 'y': 2}, 'z': 'a'}, {'m': {'y': 3}, 'z': 'b'}]
+		arrays = A.map_arrays(records)
+
+		self.assertEqual(arrays['x'].dtype, numpy.dtype('f8'))
+		self.assertEqual(arrays['x'][0], 1)
+		self.assertTrue(numpy.isnan(arrays['x'][1]))
+		self.assertEqual(arrays['y'].dtype, numpy.dtype('i4'))
+		self.assertEqual(arrays['y'].tolist(), [2, 3])
+		self.assertEqual(arrays['z'].tolist(), ['a', 'b'])
+
+		# missing values in non-float arrays are masked
+		arrays = A.map_arrays([{'m': {'y': 1}}, {'z': 'b'}])
+		self.assertEqual(arrays['y'].mask.tolist(), [False, True])
+		self.assertEqual(arrays['z'].mask.tolist(), [True, False])
+
+	def test_vectorized_parser(self):
+		calls = []
+		def double(values):
+			calls.append(values)
+			return values * 2
+
+		class A(DataStruct):
+			x = DataField(parser=double, vectorized=True, dtype='f4')
+			y = DataField(parser=lambda v: v + 1)
+
+		arrays = A.map_arrays([{'x': 1, 'y': 1}, {'x': 2, 'y': 2}])
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(arrays['x'].dtype, numpy.dtype('f4'))
+		self.assertEqual(arrays['x'].tolist(), [2, 4])
+		self.assertEqual(arrays['y'].tolist(), [2, 3])
+		# still applies to single values
+		self.assertEqual(A({'x': 1}).x, 2)
+
+
+@skipIf(numpy is None, "requires numpy")
+class TestColumnFiles(TestCase):
+
+	def test_write_and_read_structs(self):
+		import shutil
+		from tempfile import mkdtemp
+		from dstruct.export import write_records, ColumnReader
+
+		class A(DataStruct):
+			x = DataField(parser=int)
+			y = DataField(dtype='float32')
+			z = DataField()
+			w = DataField('z', slice(1, None))
+
+		records = [{'x': str(i), 'y': i / 2.0} for i in range(5)]
+		records[1]['z'] = [1, {'a': 2}]
+		records[2]['z'] = 'text'
+		records[3]['z'] = 2 ** 70
+		directory = mkdtemp()
+		try:
+			path = os.path.join(directory, 'a')
+			self.assertEqual(write_records(path, A, records), 5)
+			reader = ColumnReader(path)
+			self.assertEqual((len(reader), reader.row_groups), (5, 1))
+			columns = reader.read_columns(0)
+			self.assertEqual(columns['y'][0].dtype, numpy.dtype('float32'))
+			self.assertIsNone(columns['x'][1])
+			self.assertEqual(columns['z'][1].tolist(), [True, False, False, False, True])
+			self.assertEqual(dict((f['name'], f['path']) for f in reader.fields)['w'], ['z', '[1:]'])
+			self.assertEqual(list(reader.iter_structs(A)), list(A.map_many(records)))
+		finally:
+			shutil.rmtree(directory)
+
+	@skipIf(pyarrow is None, "requires pyarrow")
+	def test_parquet_row_groups(self):
+		import shutil
+		from tempfile import mkdtemp
+		from dstruct.export import write_structs, read_structs, ColumnReader
+
+		class A(DataStruct):
+			x = DataField(parser=int)
+			y = DataField(dtype='float32')
+			z = DataField()
+
+		records = [{'x': str(i), 'y': i / 2.0} for i in range(7)]
+		records[2]['z'] = [1, 2]
+		records[5]['z'] = 'text'
+		structs = list(A.map_many(records))
+		directory = mkdtemp()
+		try:
+			path = os.path.join(directory, 'a.parquet')
+			self.assertEqual(write_structs(path, structs, row_group_size=3), 7)
+			reader = ColumnReader(path)
+			self.assertEqual((len(reader), reader.row_groups), (7, 3))
+			self.assertEqual(list(read_structs(path, A)), structs)
+			# values later row groups can't store like the first raise errors
+			records[5]['z'] = 1
+			records[2]['z'] = 'text'
+			with self.assertRaises(ValueError):
+				write_structs(path, A.map_many(records), row_group_size=3)
+		finally:
+			shutil.rmtree(directory)
+
 
 class TestDataParser(TestCase):
 
@@ -196,6 +620,51 @@ class TestDataParser(TestCase):
 		a.x = 0
 		self.assertEqual(a.x, 1)
 
+	def test_parser_cache(self):
+		calls = []
+		def parse(value):
+			calls.append(value)
+			return value.upper()
+		class A(DataStruct):
+			x = DataField(parser=parse, cache_size=2)
+			y = DataField(parser=dataparser(func=parse, cache=LRUCache(8)))
+
+		structs = list(A.map_many({'x': v} for v in 'aabacab'))
+		self.assertEqual([s.x for s in structs], list('AABACAB'))
+		# "b" was evicted by "c"
+		self.assertEqual(calls, list('abcb'))
+		info = A.parser_cache_info()
+		self.assertEqual(info['x'], {'hits': 3, 'misses': 4, 'size': 2, 'maxsize': 2})
+		self.assertEqual(info['y']['misses'], 0)
+		A.clear_parser_caches()
+		self.assertEqual(A.parser_cache_info()['x']['size'], 0)
+
+		with self.assertRaises(ValueError):
+			class B(DataStruct):
+				@dataparser(cache=10)
+				def x(self, data):
+					pass
+
+	def test_lru_cache_threads(self):
+		import threading
+		cache = LRUCache(10)
+		double = cache.memoize(lambda v: v * 2)
+		def work():
+			for i in range(1000):
+				self.assertEqual(double(i % 20), (i % 20) * 2)
+		threads = [threading.Thread(target=work) for i in range(4)]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		info = cache.info()
+		self.assertEqual(info['hits'] + info['misses'], 4000)
+		self.assertEqual(info['size'], 10)
+		# unhashable values aren't cached
+		self.assertEqual(double([1]), [1, 1])
+		self.assertEqual(len(cache), 10)
+
+import gzip
 from tempfile import mkstemp
 
 def pytemp(filetype, content=None):
@@ -252,3 +721,365 @@ class TestLoadedStruct(TestCase):
 		expected = {"age": 40.0, "weight": 174.3}
 		self.assertEqual(narrow, expected)
 		self.assertEqual(narrow, wide)
+
+	def test_compact_table_mapping(self):
+		from dstruct.loader import CSVLoader, TableMapping, CompactTableMapping
+
+		class Bob(DataStruct):
+			age = DataField('Bob', 'Age', parser=int)
+			height = DataField('Bob', 'Height')
+
+		for text in (narrow_csv, wide_csv):
+			filename = pytemp('.csv', text)
+			table = CSVLoader(filename, compact=True).load()
+			self.assertIsInstance(table, CompactTableMapping)
+			self.assertEqual(table, CSVLoader(filename).load())
+			self.assertEqual(table.to_dict(), CSVLoader(filename).load())
+			self.assertEqual(Bob(table), {'age': 32})
+			self.assertEqual(table.cell('Alice', 'Weight'), '150')
+			self.assertEqual(table.column('Age'), ['32', '24', '64'])
+
+		rows = [['id', 'a', 'b'], ['x', '1', '2'], ['y', '1'], ['x', '3']]
+		table = CompactTableMapping(rows, 'wide')
+		self.assertEqual(table, TableMapping(rows, 'wide'))
+		self.assertEqual(table.column('b', default=''), ['', ''])
+		self.assertEqual([table.values_by_code[c] for c in table.column_codes('a')], ['3', '1'])
+		with self.assertRaises(ValueError):
+			CompactTableMapping([['a', 'b', 'c', 'd'], ['1', '2', '3', '4']], 'narrow')
+
+	def test_typed_csv_columns(self):
+		from dstruct.loader import CSVLoader, TableMapping, CompactTableMapping
+		from dstruct.utils import missing
+
+		class Person(DataStructFromCSV):
+			age = DataField('Age')
+			weight = DataField('Weight')
+
+		for text in (narrow_csv, wide_csv):
+			filename = pytemp('.csv', text)
+			for dtypes in ({'Age': int, 'Weight': 'float'}, 'infer'):
+				for compact in (False, True):
+					table = CSVLoader(filename, dtypes=dtypes, compact=compact).load()
+					self.assertEqual(dict(table['Bob']), {'Age': 32, 'Weight': 178})
+					self.assertIsInstance(table['Bob']['Weight'], float if dtypes != 'infer' else int)
+		people = list(Person.map_loader(CSVLoader(pytemp('.csv', wide_csv), dtypes='infer')))
+		self.assertEqual(people[0], {'age': 32, 'weight': 178})
+		# numeric row categories stay strings, so paths can refer to them
+		table = CSVLoader(pytemp('.csv', 'Id,Age\n1001,32\n1002,24\n'), dtypes='infer').load()
+		self.assertEqual(dict((k, dict(v)) for k, v in table.items()),
+						 {'1001': {'Age': 32}, '1002': {'Age': 24}})
+
+		rows = [['id', 'a', 'b'], ['x', '1', '1'], ['y', '', '2.5']]
+		for cls in (TableMapping, CompactTableMapping):
+			table = cls(rows, dtypes={'a': int, 'b': float})
+			self.assertEqual(dict(table['x']), {'a': 1, 'b': 1.0})
+			self.assertIsInstance(table['x']['b'], float)
+			self.assertEqual(dict(table['y']), {'a': None, 'b': 2.5})
+			self.assertEqual(dict(cls(rows, dtypes={'a': int}, empty=missing)['y']), {'b': '2.5'})
+		self.assertEqual(rows[2], ['y', '', '2.5'])
+		with self.assertRaises(ValueError):
+			TableMapping(rows, dtypes={'id': int})
+
+	def test_streamed_json_lines_struct(self):
+		class Event(DataStructFromJSONLines):
+			id = DataField()
+			kind = DataField('payload', 'kind')
+			amount = DataField('payload', 'amount', parser=float)
+
+		expected = [{'id': 1, 'kind': 'click', 'amount': 1.5},
+					{'id': 2, 'kind': 'view'},
+					{'id': 3, 'kind': 'click', 'amount': 3.0}]
+
+		filename = pytemp('.jsonl', events_jsonl)
+		events = Event.stream(filename)
+		self.assertEqual(next(events), expected[0])
+		self.assertEqual(list(events), expected[1:])
+
+		# compressed files are read transparently
+		filename = pytemp('.jsonl.gz')
+		with gzip.open(filename, 'wb') as f:
+			f.write(events_jsonl.encode('utf-8'))
+		self.assertEqual(list(Event.stream(filename)), expected)
+
+		# all documents at once
+		class Events(DataStructFromJSONLines):
+			count = DataField(path=None, parser=len)
+		self.assertEqual(Events(filename).count, 3)
+
+	def test_loader_stats(self):
+		from dstruct.loader import CSVLoader
+		from dstruct.instrument import LoaderStats
+		filename = pytemp('.json', bank_data_json)
+		loader = JSONLoader(filename)
+		loader.stats = LoaderStats()
+		self.assertEqual(loader.load(), JSONLoader(filename).load())
+		loader.load()
+		stats = loader.stats.to_dict()
+		self.assertEqual(stats['loads'], 2)
+		self.assertEqual(stats['bytes'], 2 * len(bank_data_json))
+		self.assertGreater(stats['read_seconds'], 0)
+		self.assertGreater(stats['decode_seconds'], 0)
+
+		loader = CSVLoader(pytemp('.csv', wide_csv))
+		loader.stats = LoaderStats()
+		loader.load()
+		self.assertEqual(loader.stats.bytes, len(wide_csv))
+
+	def test_parse_cache(self):
+		import shutil
+		import tempfile
+		from dstruct.loader import CSVLoader
+		from dstruct.cache import ParseCache
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+
+		cache = ParseCache(directory, memory_size=None)
+		filename = pytemp('.csv', wide_csv)
+		loader = CSVLoader(filename)
+		loader.cache = cache
+		expected = CSVLoader(filename).load()
+		self.assertEqual(loader.load(), expected)
+		self.assertEqual(loader.load(), expected)
+		self.assertEqual((cache.hits, cache.misses, cache.info()['files']), (1, 1, 1))
+		# loaders with other parameters, and changed files, aren't mixed up
+		typed = CSVLoader(filename, dtypes={'Age': int})
+		typed.cache = cache
+		self.assertEqual(typed.load()['Bob']['Age'], 32)
+		with open(filename, 'a') as f:
+			f.write('Eve,45,130\n')
+		self.assertIn('Eve', loader.load())
+		self.assertEqual((cache.hits, cache.misses, cache.info()['files']), (1, 3, 3))
+
+		# the least recently used files are evicted
+		cache.load(typed)
+		small = ParseCache(directory, max_bytes=cache.info()['bytes'] - 1)
+		JSONLoader.cache = small
+		try:
+			asum = DataStructFromJSON(pytemp('.json', bank_data_json))
+		finally:
+			del JSONLoader.cache
+		kept = os.listdir(directory)
+		self.assertIn(small.key(asum._loader) + '.pickle', kept)
+		self.assertTrue(small.info()['bytes'] <= small.max_bytes or len(kept) == 1)
+		self.assertLess(len(kept), 4)
+		self.assertIs(small.load(asum._loader), small.load(asum._loader))
+		self.assertEqual(small.info()['memory']['hits'], 2)
+		small.clear()
+		self.assertEqual(small.info()['files'], 0)
+
+		# as are loaders whose parameters are only known to this process
+		class Person(DataStructFromCSV):
+			parse_cache = cache
+			age = DataField('Bob', 'Age')
+		misses = cache.misses
+		self.assertEqual(Person(filename, dtypes={'Age': lambda s: int(s)}), {'age': 32})
+		self.assertEqual(cache.misses, misses)
+		self.assertEqual(Person(filename), {'age': '32'})
+		self.assertEqual(cache.misses, misses + 1)
+
+	def test_malformed_json_lines(self):
+		filename = pytemp('.jsonl', events_jsonl + '{"id": 4,\n{"id": 5}\n')
+		with self.assertRaises(ValueError):
+			list(JSONLinesLoader(filename).iter_records())
+
+		class Event(DataStruct):
+			id = DataField()
+		loader = JSONLinesLoader(filename, skip_errors=True)
+		ids = [e.id for e in Event.map_loader(loader)]
+		self.assertEqual(ids, [1, 2, 3, 5])
+		self.assertEqual(loader.errors, 1)
+
+	def test_mapped_byte_ranges(self):
+		from dstruct.loader import CSVLoader
+		filename = pytemp('.jsonl', events_jsonl)
+		records = list(JSONLinesLoader(filename).iter_records())
+		self.assertEqual(list(JSONLinesLoader(filename, mmap=True).iter_records()), records)
+		# every record is in exactly one of a file's consecutive ranges
+		size = os.path.getsize(filename)
+		for cut in range(size + 1):
+			ranges = [(0, cut), (cut, size)]
+			loaded = [r for b in ranges for r in
+					  JSONLinesLoader(filename, byte_range=b).iter_records()]
+			self.assertEqual(loaded, records)
+
+		filename = pytemp('.csv', wide_csv)
+		records = list(CSVLoader(filename).iter_records())
+		size = os.path.getsize(filename)
+		for cut in range(size + 1):
+			ranges = [(0, cut), (cut, size)]
+			loaded = [r for b in ranges for r in
+					  CSVLoader(filename, byte_range=b).iter_records()]
+			self.assertEqual(loaded, records)
+		self.assertEqual(CSVLoader(filename, mmap=True).load(), CSVLoader(filename).load())
+
+		filename = pytemp('.jsonl', '{"id": 1}\n{"id": \n')
+		with self.assertRaises(ValueError) as e:
+			list(JSONLinesLoader(filename, mmap=True).iter_records())
+		self.assertIn('byte 10', str(e.exception))
+
+	def test_map_shards(self):
+		filename = pytemp('.jsonl', events_jsonl * 20)
+		expected = list(Event.map_loader(JSONLinesLoader(filename)))
+		self.assertEqual(len(expected), 60)
+
+		stats = {}
+		structs = Event.map_shards(filename, shards=7, workers=2, stats=stats)
+		self.assertEqual(list(structs), expected)
+		self.assertEqual(sorted(stats), list(range(7)))
+		self.assertEqual(sum(s['records'] for s in stats.values()), 60)
+
+		structs = Event.map_shards(filename, shards=7, workers=2, ordered=False)
+		key = lambda s: (s.id, s.kind)
+		self.assertEqual(sorted(structs, key=key), sorted(expected, key=key))
+
+		columns = Event.map_shards(filename, shards=3, workers=2, columns=True)
+		self.assertEqual(columns, Event.map_columns(JSONLinesLoader(filename).iter_records()))
+
+		with self.assertRaises(ValueError):
+			Event.map_shards(filename, loader=JSONLoader)
+
+	def test_multi_file_loader(self):
+		from tempfile import mkdtemp
+		directory = mkdtemp()
+		os.mkdir(os.path.join(directory, 'nested'))
+		for i in range(12):
+			name = os.path.join('nested' if i % 4 == 0 else '', 'part-%02i.json' % i)
+			with open(os.path.join(directory, name), 'w') as f:
+				json.dump({'id': i, 'payload': {'kind': 'click'}}, f)
+
+		loader = MultiFileLoader('part-*.json', path=directory, workers=3, max_in_flight=2)
+		self.assertEqual([e.id for e in Event.map_loader(loader)],
+						 [i for i in range(12) if i % 4])
+		loader = MultiFileLoader(directory, recursive=True, ordered=False)
+		self.assertEqual(sorted(e.id for e in Event.map_loader(loader)), list(range(12)))
+
+		loader = MultiFileLoader(pytemp('.jsonl', events_jsonl), loader=JSONLinesLoader)
+		self.assertEqual([e.id for e in Event.map_loader(loader)], [1, 2, 3])
+		with self.assertRaises(IOError):
+			MultiFileLoader('missing-*.json', path=directory)
+
+	def test_streamed_json_array(self):
+		class Deposit(DataStruct):
+			amount = DataField(parser=float)
+			type = DataField('source', 'type')
+
+		expected = [{'amount': 1057.21, 'type': 'mobile-deposit'},
+					{'amount': 500.0, 'type': 'online-transfer'}]
+		filename = pytemp('.json', bank_data_json)
+		for backend in ('python', None):
+			loader = JSONArrayLoader(filename, prefix=('account', 'deposited'),
+									 chunk_size=16, backend=backend)
+			self.assertEqual(list(Deposit.map_loader(loader)), expected)
+
+		filename = pytemp('.json', '[{"amount": 1}, {"amount": 2.5}]')
+		loader = JSONArrayLoader(filename, backend='python')
+		self.assertEqual([d.amount for d in Deposit.map_loader(loader)], [1.0, 2.5])
+
+		# both backends agree on prefixes ijson can't express, and on bad ones
+		for backend in ('python', None):
+			filename = pytemp('.json', '{"item": [[1, 2]], "a": 5}')
+			loader = JSONArrayLoader(filename, prefix=('item',), backend=backend)
+			self.assertEqual(list(loader.iter_records()), [[1, 2]])
+			loader = JSONArrayLoader(filename, prefix=('a',), backend=backend)
+			self.assertRaises(ValueError, list, loader.iter_records())
+
+	def test_streamed_csv_struct(self):
+		class User(DataStructFromCSV):
+			name = DataField('Person')
+			age = DataField('Age', parser=int)
+
+		filename = pytemp('.csv', wide_csv)
+		users = User.stream(filename, sample_size=2)
+		self.assertEqual(next(users), {'name': 'Bob', 'age': 32})
+		self.assertEqual([u.name for u in users], ['Alice', 'Steve'])
+
+		# narrow tables are streamed as a single record
+		class Users(DataStructFromCSV):
+			bob = DataField('Bob', 'Age')
+		filename = pytemp('.csv', narrow_csv)
+		self.assertEqual(list(Users.stream(filename)), [{'bob': '32'}])
+		users = Users.stream(filename, table_form='narrow', sample_size=0)
+		self.assertEqual(list(users), [{'bob': '32'}])
+
+		# only the first column of a wide table has unique categories
+		filename = pytemp('.csv', wide_csv + 'Jane,32,150\n')
+		self.assertEqual(len(list(User.stream(filename))), 4)
+
+
+def run_async(aiter, loop):
+	# collect an async iterator without async syntax (for Python 2)
+	results = []
+	while True:
+		try:
+			results.append(loop.run_until_complete(aiter.__anext__()))
+		except StopAsyncIteration:
+			return results
+
+@skipIf(sys.version_info < (3, 6), "requires Python 3.6 or above")
+class TestBenchmarks(TestCase):
+
+	def test_benchmark_suite(self):
+		from dstruct.benchmarks import BENCHMARKS, Settings, run, compare, main
+		results = run(settings=Settings(records=20, repeat=1), out=None)
+		self.assertTrue(set(['descriptors', 'update', 'parsing', 'table_mapping', 'loaders'])
+						<= set(r['benchmark'] for r in results) <= set(BENCHMARKS))
+		for r in results:
+			self.assertGreater(r['records'], 0)
+			self.assertGreaterEqual(r['seconds'], 0)
+
+		filename = pytemp('.json')
+		with open(os.devnull, 'w') as devnull:
+			stdout, sys.stdout = sys.stdout, devnull
+			try:
+				main(['descriptors', '-n', '10', '-r', '1', '--output', filename])
+			finally:
+				sys.stdout = stdout
+		with open(filename) as f:
+			baseline = json.load(f)
+		self.assertEqual(baseline['settings']['records'], 10)
+		ratios = compare(baseline['results'], baseline, out=None)
+		self.assertEqual(len(ratios), len(baseline['results']))
+
+
+class TestAsyncLoadedStruct(TestCase):
+
+	def setUp(self):
+		import asyncio
+		self.loop = asyncio.new_event_loop()
+
+	def tearDown(self):
+		self.loop.close()
+
+	def test_threaded_loader(self):
+		from dstruct.aio import AsyncLoadedDataStruct, ThreadedLoader
+
+		class Event(AsyncLoadedDataStruct):
+			id = DataField()
+			kind = DataField('payload', 'kind')
+
+		filename = pytemp('.jsonl', events_jsonl)
+		events = run_async(Event.astream(JSONLinesLoader, filename), self.loop)
+		self.assertEqual([e.id for e in events], [1, 2, 3])
+
+		filename = pytemp('.json', bank_data_json)
+		class Account(AsyncLoadedDataStruct):
+			kind = DataField('account', 'account-type')
+		account = self.loop.run_until_complete(Account.aload(JSONLoader, filename))
+		self.assertEqual(account.kind, 'checking')
+
+		# the reader stops when iteration stops early
+		filename = pytemp('.jsonl', '{"id": 1}\n' * 100)
+		loader = ThreadedLoader(JSONLinesLoader(filename), queue_size=2)
+		events = Event.astream(loader)
+		self.assertEqual(self.loop.run_until_complete(events.__anext__()).id, 1)
+		self.loop.run_until_complete(events.aclose())
+
+	def test_iterable_source(self):
+		from dstruct.aio import AsyncLoadedDataStruct, IterableSource
+
+		class Event(AsyncLoadedDataStruct):
+			id = DataField(parser=int)
+
+		source = IterableSource([{'id': '1'}, {}, {'id': '3'}], delay=0.001)
+		events = run_async(Event.astream(source), self.loop)
+		self.assertEqual(events, [{'id': 1}, {}, {'id': 3}])
@@ -1,7 +1,15 @@
 """Various utility functions"""
 
+import io
 import os
+import bz2
+import glob
+import gzip
+import mmap
 import inspect
+import contextlib
+import threading
+from collections import OrderedDict
 import six
 
 def class_of(value):
@@ -14,6 +22,182 @@ def class_of(value):
 def repr_of(value):
     return "%r %r" % (value, type(value))
 
+class Missing(object):
+    """Marks the place of an absent value - pickled as the ``missing`` singleton"""
+
+    def __reduce__(self):
+        return 'missing'
+
+    def __repr__(self):
+        return 'missing'
+
+missing = Missing()
+
+class LRUCache(object):
+
+    def __init__(self, maxsize=128):
+        """A thread safe cache which evicts its least recently used items
+
+        Parameters
+        ----------
+        maxsize: int
+            The number of items kept - once full, adding an item
+            discards the one that was least recently used.
+        """
+        if maxsize < 1:
+            raise ValueError("The size of a cache must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                # move the item to the most recently used end
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Discard every item and reset the hit and miss counts"""
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Return the ``hits``, ``misses``, current ``size`` and ``maxsize`` of this cache"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._items), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._items)
+
+    def memoize(self, func):
+        """Wrap a function of one argument so its results are kept in this cache
+
+        Results are cached by the type and value of the argument. Unhashable
+        arguments are passed to the function without being cached.
+        """
+        def cached(value):
+            key = (value.__class__, value)
+            try:
+                result = self.get(key, missing)
+            except TypeError:
+                return func(value)
+            if result is missing:
+                result = func(value)
+                self.put(key, result)
+            return result
+        cached.__wrapped__ = func
+        return cached
+
+def open_file(filename, buffer_size=-1, newline=None, binary=False):
+    """Open a file for reading text, decompressing gzip and bz2 files
+
+    Compressed files are recognized by their leading bytes rather than their
+    extension. The ``buffer_size`` of a file is the number of bytes read from
+    it at a time (the default is chosen by :func:`io.open`). If ``binary`` is
+    true the file is opened for reading bytes instead.
+    """
+    compression = file_compression(filename)
+    if compression == 'gzip':
+        raw = gzip.GzipFile(filename, 'rb')
+    elif compression == 'bz2':
+        raw = bz2.BZ2File(filename, 'rb')
+    elif binary:
+        return io.open(filename, 'rb', buffering=buffer_size)
+    else:
+        return io.open(filename, 'r', buffering=buffer_size, newline=newline)
+    if buffer_size > 0:
+        raw = io.BufferedReader(raw, buffer_size)
+    return raw if binary else io.TextIOWrapper(raw, newline=newline)
+
+def file_compression(filename):
+    """Return "gzip" or "bz2" if a file is compressed with either, otherwise None"""
+    with io.open(filename, 'rb') as f:
+        magic = f.read(3)
+    if magic[:2] == b'\x1f\x8b':
+        return 'gzip'
+    elif magic == b'BZh':
+        return 'bz2'
+    else:
+        return None
+
+@contextlib.contextmanager
+def map_file(filename):
+    """Memory map a file for reading bytes
+
+    Slices of the map are read from the operating system's page cache on
+    demand, rather than through Python's buffered I/O. Compressed files
+    cannot be mapped. Empty files are given as an empty bytes object.
+    """
+    if file_compression(filename) is not None:
+        raise ValueError("Compressed files cannot be memory mapped: %r" % filename)
+    with io.open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            buf = None
+        else:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buf is None:
+        yield b''
+        return
+    try:
+        yield buf
+    finally:
+        buf.close()
+
+def aligned_range(buf, start=0, end=None, sep=b'\n'):
+    """Align a byte range of a buffer to the records separated by ``sep``
+
+    Returns the offsets of the first record which begins at or after ``start``,
+    and of the end of the last record which begins before ``end``. Splitting
+    a buffer into consecutive ranges therefore assigns each record to exactly
+    one of them.
+    """
+    size = len(buf)
+    end = size if end is None else min(end, size)
+    if start > 0:
+        i = buf.find(sep, start - 1)
+        start = size if i == -1 else i + len(sep)
+    if end < size and start < end:
+        i = buf.find(sep, end - 1)
+        end = size if i == -1 else i + len(sep)
+    return start, max(start, end)
+
+def iter_lines(buf, start=0, end=None, block_size=1 << 20):
+    """Lazily yield the offset and bytes of each line in a range of a buffer
+
+    Lines keep their line endings. The buffer is copied (and split into
+    lines) one block of whole lines at a time.
+    """
+    end = len(buf) if end is None else end
+    pos = start
+    while pos < end:
+        stop = min(pos + block_size, end)
+        if stop < end:
+            i = buf.rfind(b'\n', pos, stop)
+            if i == -1:
+                # a line longer than the block
+                i = buf.find(b'\n', stop, end)
+            stop = end if i == -1 else i + 1
+        for line in buf[pos:stop].splitlines(True):
+            yield pos, line
+            pos += len(line)
+
 # Parts below taken from ipython:
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
@@ -65,6 +249,64 @@ def find_file(filename, path_dirs=None):
                   (filename, path_dirs) )
 
 
+def find_files(patterns, path_dirs=None, recursive=False):
+    """Find the files matched by a sequence of glob patterns or directories.
+    Each pattern is looked for in the path dirs like the filename given to
+    :func:`find_file`. Patterns which name a directory match the files in it.
+    Parameters
+    ----------
+    patterns : str or sequence of str
+        The glob patterns, directories or filenames to look for.
+    path_dirs : str, None or sequence of str
+        The sequence of paths to look for the files in (see :func:`find_file`).
+    recursive : bool
+        Whether the files in subdirectories of directories are included.
+    Returns
+    -------
+    Raises :exc:`IOError` if a pattern matches no files, or returns a sorted
+    list of absolute paths to the files of each pattern in turn.
+    """
+    if isinstance(patterns, six.string_types):
+        patterns = (patterns,)
+    if path_dirs is None:
+        path_dirs = ("",)
+    elif isinstance(path_dirs, six.string_types):
+        path_dirs = (path_dirs,)
+
+    found, seen = [], set()
+    for pattern in patterns:
+        pattern = pattern.strip('"').strip("'")
+        matched = []
+        for path in path_dirs:
+            if path == '.': path = os.getcwd()
+            testname = expand_path(os.path.join(path, pattern))
+            for name in sorted(glob.glob(testname)):
+                if os.path.isdir(name):
+                    matched.extend(_directory_files(name, recursive))
+                elif os.path.isfile(name):
+                    matched.append(os.path.abspath(name))
+            if matched:
+                break
+        if not matched:
+            raise IOError("No files match %r in any of the search paths: %r" %
+                          (pattern, path_dirs))
+        for f in matched:
+            if f not in seen:
+                seen.add(f)
+                found.append(f)
+    return found
+
+
+def _directory_files(directory, recursive):
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        files.extend(os.path.abspath(os.path.join(root, n)) for n in sorted(names))
+        if not recursive:
+            break
+    return files
+
+
 def expand_path(s):
     """Expand $VARS and ~names in a string, like a shell
     :Examples: